@@ -12,53 +12,108 @@
 # Pieter Abbeel (pabbeel@cs.berkeley.edu).
 
 
-import search
+import bisect
+import collections
+import math
+import mmap
+import os
 import random
 
+import search
+
 
 # Module Classes
 
-class EightPuzzleState:
+class _PuzzleBoard:
     """
-    The Eight Puzzle is described in the course textbook on
-    page 64.
+      The tables shared by every puzzle of one size.
 
-    This class defines the mechanics of the puzzle itself.  The
-    task of recasting this puzzle as a search problem is left to
-    the EightPuzzleSearchProblem class.
+    A puzzle is packed into one int, 'bits' bits per cell: the tile on cell
+    row * size + col is stored in bits bits * cell to bits * (cell + 1) - 1.
     """
 
-    def __init__(self, numbers):
-        """
-          Constructs a new eight puzzle from an ordering of numbers.
+    def __init__(self, size):
+        self.size = size
+        self.numCells = size * size
+        self.bits = max(4, (self.numCells - 1).bit_length())
+        self.mask = (1 << self.bits) - 1
+        # The goal has the blank on the first cell and tile t on cell t
+        self.goal = sum(tile << self.bits * tile for tile in range(self.numCells))
 
-        numbers: a list of integers from 0 to 8 representing an
-          instance of the eight puzzle.  0 represents the blank
-          space.  Thus, the list
+        # Legal moves of the blank from each cell, and the cell each move takes it to
+        offsets = {'up': -size, 'down': size, 'left': -1, 'right': 1}
+        self.legalMoves = []
+        self.moveTargets = []
+        for blank in range(self.numCells):
+            row, col = divmod(blank, size)
+            moves = tuple([move for move, legal in (('up', row != 0), ('down', row != size - 1),
+                                                    ('left', col != 0), ('right', col != size - 1)) if legal])
+            self.legalMoves.append(moves)
+            self.moveTargets.append({move: blank + offsets[move] for move in moves})
 
-            [1, 0, 2, 3, 4, 5, 6, 7, 8]
+        # distances[tile][cell]: Manhattan distance from cell to the goal cell of tile (0 for the blank)
+        self.distances = [[0] * self.numCells] + \
+                         [[abs(cell // size - tile // size) + abs(cell % size - tile % size) for cell in range(self.numCells)]
+                          for tile in range(1, self.numCells)]
 
-          represents the eight puzzle:
-            -------------
-            | 1 |   | 2 |
-            -------------
-            | 3 | 4 | 5 |
-            -------------
-            | 6 | 7 | 8 |
-            ------------
 
-        The configuration of the puzzle is stored in a 2-dimensional
-        list (a list of lists) 'cells'.
+_BOARDS = {}
+
+
+def _getBoard(size):
+    board = _BOARDS.get(size)
+    if board is None:
+        board = _BOARDS[size] = _PuzzleBoard(size)
+    return board
+
+
+class SlidingPuzzleState:
+    """
+      A sliding tile puzzle on an N x N board (the 8-puzzle when N is 3, the
+    15-puzzle when N is 4, ...) with the mechanics of EightPuzzleState.
+
+    The configuration is packed into the int 'packed' (see _PuzzleBoard),
+    'blank' is the cell of the blank space and 'board' the tables shared by
+    the puzzles of this size; 'cells' rebuilds it as a 2-dimensional list.
+    """
+
+    __slots__ = ('packed', 'blank', 'board')
+
+    def __init__(self, numbers):
+        """
+          Constructs a new puzzle from an ordering of the numbers 0 to
+        N * N - 1, 0 being the blank space and the board being read row by
+        row.
+        """
+        size = math.isqrt(len(numbers))
+        if size < 2 or size * size != len(numbers):
+            raise ValueError(f'{len(numbers)} numbers do not fill a square board')
+        self.board = _getBoard(size)
+        self.packed = 0
+        for cell, number in enumerate(numbers):
+            self.packed |= number << self.board.bits * cell
+            if number == 0:
+                self.blank = cell
+
+    @property
+    def size(self):
+        return self.board.size
+
+    @property
+    def cells(self):
+        return [self.getNumbers()[row * self.size:(row + 1) * self.size] for row in range(self.size)]
+
+    @property
+    def blankLocation(self):
+        return divmod(self.blank, self.size)
+
+    def getNumbers(self):
         """
-        self.cells = []
-        numbers = numbers[:]  # Make a copy so as not to cause side-effects.
-        numbers.reverse()
-        for row in range(3):
-            self.cells.append([])
-            for col in range(3):
-                self.cells[row].append(numbers.pop())
-                if self.cells[row][col] == 0:
-                    self.blankLocation = row, col
+          Returns the numbers of the puzzle row by row, as given to the
+        constructor.
+        """
+        packed, bits, mask = self.packed, self.board.bits, self.board.mask
+        return [packed >> bits * cell & mask for cell in range(self.board.numCells)]
 
     def isGoal(self):
         """
@@ -78,13 +133,24 @@ class EightPuzzleState:
         >>> EightPuzzleState([1, 0, 2, 3, 4, 5, 6, 7, 8]).isGoal()
         False
         """
-        current = 0
-        for row in range(3):
-            for col in range(3):
-                if current != self.cells[row][col]:
-                    return False
-                current += 1
-        return True
+        return self.packed == self.board.goal
+
+    def isSolvable(self):
+        """
+          Whether the goal can be reached from this puzzle.  Moves keep the
+        parity of the number of inverted tile pairs, plus the row of the
+        blank on boards of even size, so it must match that of the goal.
+
+        >>> EightPuzzleState([1, 0, 2, 3, 4, 5, 6, 7, 8]).isSolvable()
+        True
+        >>> EightPuzzleState([0, 2, 1, 3, 4, 5, 6, 7, 8]).isSolvable()
+        False
+        """
+        tiles = [tile for tile in self.getNumbers() if tile != 0]
+        inversions = sum(1 for i in range(len(tiles)) for j in range(i + 1, len(tiles)) if tiles[i] > tiles[j])
+        if self.size % 2 == 0:
+            inversions += self.blank // self.size
+        return inversions % 2 == 0
 
     def legalMoves(self):
         """
@@ -96,87 +162,74 @@ class EightPuzzleState:
         >>> EightPuzzleState([0, 1, 2, 3, 4, 5, 6, 7, 8]).legalMoves()
         ['down', 'right']
         """
-        moves = []
-        row, col = self.blankLocation
-        if row != 0:
-            moves.append('up')
-        if row != 2:
-            moves.append('down')
-        if col != 0:
-            moves.append('left')
-        if col != 2:
-            moves.append('right')
-        return moves
+        return list(self.board.legalMoves[self.blank])
 
     def result(self, move):
         """
-          Returns a new eightPuzzle with the current state and blankLocation
+          Returns a new puzzle with the current state and blankLocation
         updated based on the provided move.
 
         The move should be a string drawn from a list returned by legalMoves.
-        Illegal moves will raise an exception, which may be an array bounds
-        exception.
+        Illegal moves will raise an exception.
 
         NOTE: This function *does not* change the current object.  Instead,
         it returns a new object.
-        """
-        row, col = self.blankLocation
-        if move == 'up':
-            newrow = row - 1
-            newcol = col
-        elif move == 'down':
-            newrow = row + 1
-            newcol = col
-        elif move == 'left':
-            newrow = row
-            newcol = col - 1
-        elif move == 'right':
-            newrow = row
-            newcol = col + 1
-        else:
-            raise "Illegal Move"
-
-        # Create a copy of the current eightPuzzle
-        newPuzzle = EightPuzzleState([0, 0, 0, 0, 0, 0, 0, 0, 0])
-        newPuzzle.cells = [values[:] for values in self.cells]
-        # And update it to reflect the move
-        newPuzzle.cells[row][col] = self.cells[newrow][newcol]
-        newPuzzle.cells[newrow][newcol] = self.cells[row][col]
-        newPuzzle.blankLocation = newrow, newcol
 
+        >>> print(EightPuzzleState([1, 0, 2, 3, 4, 5, 6, 7, 8]).result('down'))
+        -------------
+        | 1 | 4 | 2 |
+        -------------
+        | 3 |   | 5 |
+        -------------
+        | 6 | 7 | 8 |
+        -------------
+        """
+        board = self.board
+        target = board.moveTargets[self.blank].get(move)
+        if target is None:
+            raise Exception("Illegal Move")
+
+        # The tile on the target cell slides into the blank
+        tile = self.packed >> board.bits * target & board.mask
+        newPuzzle = self.__class__.__new__(self.__class__)
+        newPuzzle.packed = self.packed - (tile << board.bits * target) + (tile << board.bits * self.blank)
+        newPuzzle.blank = target
+        newPuzzle.board = board
         return newPuzzle
 
     # Utilities for comparison and display
     def __eq__(self, other):
         """
-            Overloads '==' such that two eightPuzzles with the same configuration
+            Overloads '==' such that two puzzles with the same configuration
           are equal.
 
           >>> EightPuzzleState([0, 1, 2, 3, 4, 5, 6, 7, 8]) == \
               EightPuzzleState([1, 0, 2, 3, 4, 5, 6, 7, 8]).result('left')
           True
         """
-        for row in range(3):
-            if self.cells[row] != other.cells[row]:
-                return False
-        return True
+        return self.packed == other.packed and self.board.size == other.board.size
 
     def __hash__(self):
-        return hash(str(self.cells))
+        return hash(self.packed)
+
+    def __reduce__(self):
+        # Pickles and copies keep only the numbers and share the tables of their size
+        return type(self), (self.getNumbers(),)
 
     def __getAsciiString(self):
         """
           Returns a display string for the maze
         """
         lines = []
-        horizontalLine = '-' * 13
+        width = len(str(self.board.numCells - 1))
+        horizontalLine = '-' * (self.size * (width + 3) + 1)
         lines.append(horizontalLine)
         for row in self.cells:
             rowLine = '|'
             for col in row:
                 if col == 0:
                     col = ' '
-                rowLine = f'{rowLine} {col} |'
+                rowLine = f'{rowLine} {col:>{width}} |'
             lines.append(rowLine)
             lines.append(horizontalLine)
         return '\n'.join(lines)
@@ -185,13 +238,54 @@ class EightPuzzleState:
         return self.__getAsciiString()
 
 
+class EightPuzzleState(SlidingPuzzleState):
+    """
+    The Eight Puzzle is described in the course textbook on
+    page 64.
+
+    This class defines the mechanics of the puzzle itself.  The
+    task of recasting this puzzle as a search problem is left to
+    the EightPuzzleSearchProblem class.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, numbers):
+        """
+          Constructs a new eight puzzle from an ordering of numbers.
+
+        numbers: a list of integers from 0 to 8 representing an
+          instance of the eight puzzle.  0 represents the blank
+          space.  Thus, the list
+
+            [1, 0, 2, 3, 4, 5, 6, 7, 8]
+
+          represents the eight puzzle:
+            -------------
+            | 1 |   | 2 |
+            -------------
+            | 3 | 4 | 5 |
+            -------------
+            | 6 | 7 | 8 |
+            ------------
+
+        The configuration of the puzzle is packed into an int (see
+        SlidingPuzzleState); 'cells' gives it as a 2-dimensional list (a
+        list of lists).
+        """
+        if len(numbers) != 9:
+            raise ValueError('an eight puzzle needs 9 numbers')
+        super().__init__(numbers)
+
+
 # TODO: Implement The methods in this class
 
 class EightPuzzleSearchProblem(search.SearchProblem):
     """
       Implementation of a SearchProblem for the  Eight Puzzle domain
 
-      Each state is represented by an instance of an eightPuzzle.
+      Each state is represented by an instance of an eightPuzzle.  Any
+      SlidingPuzzleState works the same way.
     """
 
     def __init__(self, puzzle):
@@ -222,6 +316,227 @@ class EightPuzzleSearchProblem(search.SearchProblem):
         return len(actions)
 
 
+# Sliding puzzles of any size are searched exactly like the eight puzzle
+SlidingPuzzleSearchProblem = EightPuzzleSearchProblem
+
+
+def manhattanHeuristic(state, problem=None):
+    """
+      The sum of the Manhattan distances from every tile to its goal cell.
+
+    >>> manhattanHeuristic(EightPuzzleState([1, 0, 2, 3, 4, 5, 6, 7, 8]))
+    1
+    """
+    board, packed = state.board, state.packed
+    bits, mask, distances = board.bits, board.mask, board.distances
+    return sum([distances[packed >> bits * cell & mask][cell] for cell in range(board.numCells)])
+
+
+def linearConflictHeuristic(state, problem=None):
+    """
+      The Manhattan distance plus 2 moves for every tile that has to leave its
+    goal row (or column) to let other tiles of that line past it: in each
+    line, the tiles whose goal is in the line and that are not part of the
+    longest run already in goal order.  Admissible and consistent.
+
+    >>> linearConflictHeuristic(EightPuzzleState([0, 2, 1, 3, 4, 5, 6, 7, 8]))
+    4
+    """
+    size = state.size
+    numbers = state.getNumbers()
+    conflicts = 0
+    for line in range(size):
+        rowTiles = [tile % size for tile in numbers[line * size:(line + 1) * size] if tile and tile // size == line]
+        columnTiles = [tile // size for tile in numbers[line::size] if tile and tile % size == line]
+        conflicts += len(rowTiles) - _longestIncreasingRun(rowTiles)
+        conflicts += len(columnTiles) - _longestIncreasingRun(columnTiles)
+    return manhattanHeuristic(state) + 2 * conflicts
+
+
+def _longestIncreasingRun(values):
+    """Length of the longest increasing subsequence of 'values'"""
+    tails = []
+    for value in values:
+        position = bisect.bisect_left(tails, value)
+        if position == len(tails):
+            tails.append(value)
+        else:
+            tails[position] = value
+    return len(tails)
+
+
+# Pattern databases
+
+# Disjoint groups of tiles; their pattern database values add up to an admissible heuristic
+PATTERN_GROUPS = ((1, 2, 3, 4), (5, 6, 7, 8))
+PATTERN_DATABASE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'eightpuzzle.pdb')
+PATTERN_DATABASE_MAGIC = b'8PDB'
+PATTERN_DATABASE_VERSION = 1
+
+# The cells next to each cell of the 3x3 board, cells being numbered row by row
+_NEIGHBOR_CELLS = [[row * 3 + col for row, col in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1))
+                    if 0 <= row < 3 and 0 <= col < 3]
+                   for r in range(3) for c in range(3)]
+
+
+class PatternDatabase:
+    """
+      Additive pattern databases for the eight puzzle.
+
+    For each group of tiles in PATTERN_GROUPS there is a table giving, for
+    every placement of the group's tiles and the blank, the fewest moves of
+    those tiles needed to bring them home, moves of the other tiles being
+    free.  The groups are disjoint, so the values of all groups add up to an
+    admissible and consistent heuristic.  A placement is indexed by the
+    cells of the blank and of the group's tiles written as a base 9 number,
+    the blank first and the first tile last.
+
+    The tables live in a compact file (see save) that load memory maps, so a
+    lookup is a single byte read.
+    """
+
+    def __init__(self, groups, tables):
+        self.groups = groups
+        self.tables = tables
+
+    @staticmethod
+    def build(groups=PATTERN_GROUPS):
+        return PatternDatabase(groups, [_buildPatternTable(group) for group in groups])
+
+    def save(self, path):
+        """
+          Writes the databases to 'path': the magic bytes, a version byte and
+        the number of groups, then for each group its size, its tiles and its
+        9 ** (size + 1) table of one byte entries.
+        """
+        parts = [PATTERN_DATABASE_MAGIC, bytes([PATTERN_DATABASE_VERSION, len(self.groups)])]
+        for group, table in zip(self.groups, self.tables):
+            parts.append(bytes([len(group)] + list(group)))
+            parts.append(bytes(table))
+        temporaryPath = f'{path}.{os.getpid()}.tmp'
+        with open(temporaryPath, 'wb') as f:
+            f.write(b''.join(parts))
+        os.replace(temporaryPath, path)
+
+    @staticmethod
+    def load(path):
+        """
+          Memory maps the databases saved in 'path'.  Raises ValueError if the
+        file is not a pattern database of this version or does not have the
+        length its headers announce (e.g. it was truncated).
+        """
+        with open(path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(data) < 6 or data[:4] != PATTERN_DATABASE_MAGIC or data[4] != PATTERN_DATABASE_VERSION:
+            raise ValueError(f'{path} is not a version {PATTERN_DATABASE_VERSION} pattern database')
+        groups, tables = [], []
+        offset = 6
+        view = memoryview(data)
+        for _ in range(data[5]):
+            if offset >= len(data):
+                break
+            size = data[offset]
+            groups.append(tuple(data[offset + 1:offset + 1 + size]))
+            offset += 1 + size
+            tables.append(view[offset:offset + 9 ** (size + 1)])
+            offset += 9 ** (size + 1)
+        if len(groups) != data[5] or offset != len(data):
+            raise ValueError(f'{path} does not have the length of its pattern databases')
+        return PatternDatabase(tuple(groups), tables)
+
+    def getValue(self, cellOf):
+        """
+          Returns the heuristic value of a puzzle whose tile t is on cell
+        cellOf[t] (the blank being tile 0).
+        """
+        value = 0
+        for group, table in zip(self.groups, self.tables):
+            index = cellOf[0]
+            for tile in reversed(group):
+                index = index * 9 + cellOf[tile]
+            value += table[index]
+        return value
+
+
+def _buildPatternTable(group):
+    """
+      Builds the table of one group of tiles with a retrograde 0-1 breadth
+    first search from the goal over (tile cells, blank cell) placements:
+    moving one of the group's tiles costs 1, moving any other tile costs 0.
+    """
+    size = len(group)
+    blankWeight = 9 ** size
+    costs = bytearray([255]) * (9 ** size * 9)
+    goal = sum(tile * 9 ** i for i, tile in enumerate(group))  # Tile t starts on cell t, the blank on 0
+    costs[goal] = 0
+    queue = collections.deque([goal])
+    while queue:
+        index = queue.popleft()
+        cost = costs[index]
+        blank, placement = divmod(index, blankWeight)
+        cells = [placement // 9 ** i % 9 for i in range(size)]
+        for cell in _NEIGHBOR_CELLS[blank]:
+            if cell in cells:
+                # One of the group's tiles slides into the blank
+                member = cells.index(cell)
+                nextIndex = cell * blankWeight + placement + (blank - cell) * 9 ** member
+                nextCost = cost + 1
+            else:
+                nextIndex = cell * blankWeight + placement
+                nextCost = cost
+            if nextCost < costs[nextIndex]:
+                costs[nextIndex] = nextCost
+                if nextCost == cost:
+                    queue.appendleft(nextIndex)
+                else:
+                    queue.append(nextIndex)
+    return costs
+
+
+# Pattern databases by absolute file path
+_PATTERN_DATABASES = {}
+
+
+def getPatternDatabase(path=PATTERN_DATABASE_FILE):
+    """
+      Returns the pattern databases of 'path', loading them from that file
+    or, the first time, building them and saving them there (they are kept
+    in memory if the file cannot be written).  Each path is loaded once.
+    """
+    key = os.path.abspath(path)
+    database = _PATTERN_DATABASES.get(key)
+    if database is None:
+        try:
+            database = PatternDatabase.load(path)
+        except (OSError, ValueError):
+            database = PatternDatabase.build()
+            try:
+                database.save(path)
+                database = PatternDatabase.load(path)
+            except OSError:
+                pass
+        _PATTERN_DATABASES[key] = database
+    return database
+
+
+def patternDatabaseHeuristic(state, problem=None):
+    """
+      An admissible and consistent heuristic for the EightPuzzleSearchProblem
+    read from the additive pattern databases.
+
+    >>> patternDatabaseHeuristic(EightPuzzleState([0, 1, 2, 3, 4, 5, 6, 7, 8]))
+    0
+    >>> patternDatabaseHeuristic(loadEightPuzzle(0))
+    1
+    """
+    if state.size != 3:
+        raise ValueError('the pattern databases are for the eight puzzle')
+    cellOf = [0] * 9
+    for cell, tile in enumerate(state.getNumbers()):
+        cellOf[tile] = cell
+    return getPatternDatabase().getValue(cellOf)
+
+
 EIGHT_PUZZLE_DATA = [[1, 0, 2, 3, 4, 5, 6, 7, 8],
                      [1, 7, 8, 2, 3, 4, 5, 6, 0],
                      [4, 3, 2, 7, 0, 5, 1, 6, 8],
@@ -266,6 +581,32 @@ def createRandomEightPuzzle(moves=100):
     return puzzle
 
 
+def createRandomSlidingPuzzle(size=4, moves=None):
+    """
+      size: the width of the board
+      moves: number of random moves to apply, or None
+
+      Creates a random size x size puzzle, either by applying 'moves' random
+      moves to a solved puzzle or, when moves is None, by drawing a random
+      solvable arrangement of the tiles.
+    """
+    if moves is not None:
+        puzzle = SlidingPuzzleState(list(range(size * size)))
+        for i in range(moves):
+            puzzle = puzzle.result(random.choice(puzzle.legalMoves()))
+        return puzzle
+
+    numbers = list(range(size * size))
+    random.shuffle(numbers)
+    puzzle = SlidingPuzzleState(numbers)
+    if not puzzle.isSolvable():
+        # Swapping two tiles flips the parity of the inversions
+        first, second = [cell for cell, number in enumerate(numbers) if number != 0][:2]
+        numbers[first], numbers[second] = numbers[second], numbers[first]
+        puzzle = SlidingPuzzleState(numbers)
+    return puzzle
+
+
 def main():
     puzzle = createRandomEightPuzzle(25)
     print('A random puzzle:')
@@ -20,7 +20,10 @@
 # John DeNero (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
 # For more info, see http://inst.eecs.berkeley.edu/~cs188/sp09/pacman.html
 
+import collections
+import struct
 import traceback
+import weakref
 from abc import ABC, abstractmethod
 
 from util import *
@@ -87,11 +90,17 @@ class Configuration:
 
     The convention for positions, like a graph, is that (0,0) is the lower left corner, x increases
     horizontally and y increases vertically.  Therefore, north is the direction of increasing y, or (0,1).
+
+    Configurations are immutable (moving creates a new one), so they are
+    shared freely between states and hash to a value computed once.
     """
 
+    __slots__ = ('pos', 'direction', '_hash')
+
     def __init__(self, pos, direction):
         self.pos = pos
         self.direction = direction
+        self._hash = hash((pos, direction))
 
     def getPosition(self):
         return self.pos
@@ -104,13 +113,12 @@ class Configuration:
         return x == int(x) and y == int(y)
 
     def __eq__(self, other):
+        if other is self: return True
         if other is None: return False
         return self.pos == other.pos and self.direction == other.direction
 
     def __hash__(self):
-        x = hash(self.pos)
-        y = hash(self.direction)
-        return hash(x + 13 * y)
+        return self._hash
 
     def __str__(self):
         return "(x,y)=" + str(self.pos) + ", " + str(self.direction)
@@ -136,6 +144,8 @@ class AgentState:
     AgentStates hold the state of an agent (configuration, speed, scared, etc).
     """
 
+    __slots__ = ('start', 'configuration', 'isPacman', 'scaredTimer', 'numCarrying', 'numReturned')
+
     def __init__(self, startConfiguration, isPacman):
         self.start = startConfiguration
         self.configuration = startConfiguration
@@ -151,15 +161,19 @@ class AgentState:
             return "Ghost: " + str(self.configuration)
 
     def __eq__(self, other):
+        if other is self:
+            return True
         if other is None:
             return False
         return self.configuration == other.configuration and self.scaredTimer == other.scaredTimer
 
     def __hash__(self):
-        return hash(hash(self.configuration) + 13 * hash(self.scaredTimer))
+        return hash(self.configuration) + 13 * hash(self.scaredTimer)
 
     def copy(self):
-        state = AgentState(self.start, self.isPacman)
+        state = AgentState.__new__(AgentState)
+        state.start = self.start
+        state.isPacman = self.isPacman
         state.configuration = self.configuration
         state.scaredTimer = self.scaredTimer
         state.numCarrying = self.numCarrying
@@ -174,11 +188,57 @@ class AgentState:
         return self.configuration.getDirection()
 
 
+class _GridColumn(bytearray):
+    """
+    One column of a Grid: a bytearray holding 1 for True and 0 for False.
+    Cells read back as booleans; writes also keep the summary the grid
+    shares with its columns up to date ([count of True cells, cached hash]).
+    """
+
+    __slots__ = ('summary',)
+
+    def __init__(self, values, summary=None):
+        super().__init__(values)
+        self.summary = summary if summary is not None else [self.count(1), None]
+
+    def __getitem__(self, y):
+        if isinstance(y, slice):
+            return [value == 1 for value in bytearray.__getitem__(self, y)]
+        return bytearray.__getitem__(self, y) == 1
+
+    def __iter__(self):
+        return iter([value == 1 for value in bytearray.__iter__(self)])
+
+    def __repr__(self):
+        return repr(list(self))
+
+    __str__ = __repr__
+
+    def __setitem__(self, y, value):
+        summary = self.summary
+        if isinstance(y, slice):
+            before = self.count(1)
+            bytearray.__setitem__(self, y, bytes([1 if v else 0 for v in value]))
+            summary[0] += self.count(1) - before
+        else:
+            value = 1 if value else 0
+            summary[0] += value - bytearray.__getitem__(self, y)
+            bytearray.__setitem__(self, y, value)
+        summary[1] = None
+
+    def __reduce__(self):
+        return _GridColumn, (bytes(self), self.summary)
+
+
 class Grid:
     """
-    A 2-dimensional array of objects backed by a list of lists.  Data is accessed
-    via grid[x][y] where (x,y) are positions on a Pacman map with x horizontal,
-    y vertical and the origin (0,0) in the bottom left corner.
+    A 2-dimensional array of booleans backed by one bytearray per column.  Data
+    is accessed via grid[x][y] where (x,y) are positions on a Pacman map with x
+    horizontal, y vertical and the origin (0,0) in the bottom left corner.
+
+    The grid keeps a running count of its True cells, updated on every
+    grid[x][y] = value, so count() is O(1); its hash is computed over the raw
+    bytes and cached until the next write.
 
     The __str__ method constructs an output that is oriented like a pacman board.
     """
@@ -189,57 +249,88 @@ class Grid:
 
         self.width = width
         self.height = height
-        self.data = [[initialValue for _ in range(height)] for _ in range(width)]
+        self._setColumns([bytes([initialValue]) * height for _ in range(width)],
+                         width * height if initialValue else 0)
         if bitRepresentation:
             self._unpackBits(bitRepresentation)
 
+    def _setColumns(self, columns, trueCount=None):
+        """Stores copies of 'columns' as the grid data with a fresh summary"""
+        if trueCount is None:
+            trueCount = sum([column.count(1) for column in columns])
+        self._summary = [trueCount, None]
+        self.data = [_GridColumn(column, self._summary) for column in columns]
+
     def __getitem__(self, i):
         return self.data[i]
 
+    def __setstate__(self, state):
+        # Grids pickled before the bytearray columns (e.g. in old recorded
+        # games) hold a list of lists of booleans and no summary
+        self.__dict__.update(state)
+        if '_summary' not in state:
+            self._setColumns([bytes([1 if value else 0 for value in column]) for column in self.data])
+
     def __setitem__(self, key, item):
-        self.data[key] = item
+        column = _GridColumn([1 if value else 0 for value in item], self._summary)
+        self._summary[0] += column.count(1) - self.data[key].count(1)
+        self._summary[1] = None
+        self.data[key] = column
 
     def __str__(self):
-        out = [[str(self.data[x][y])[0] for x in range(self.width)] for y in range(self.height)]
+        out = [['T' if self.data[x][y] else 'F' for x in range(self.width)] for y in range(self.height)]
         out.reverse()
         return '\n'.join([''.join(x) for x in out])
 
     def __eq__(self, other):
-        if other is None: return False
+        if not isinstance(other, Grid): return False
+        if self._summary[0] != other._summary[0]: return False
         return self.data == other.data
 
     def __hash__(self):
-        # return hash(str(self))
-        base = 1
-        h = 0
-        for l in self.data:
-            for i in l:
-                if i:
-                    h += base
-                base *= 2
-        return hash(h)
+        summary = self._summary
+        if summary[1] is None:
+            summary[1] = hash(b''.join(self.data))
+        return summary[1]
 
     def copy(self):
-        grid = Grid(self.width, self.height)
-        grid.data = [x[:] for x in self.data]
+        grid = Grid.__new__(Grid)
+        grid.CELLS_PER_INT = self.CELLS_PER_INT
+        grid.width = self.width
+        grid.height = self.height
+        grid._setColumns(self.data, self._summary[0])
         return grid
 
     def deepCopy(self):
         return self.copy()
 
     def shallowCopy(self):
-        grid = Grid(self.width, self.height)
+        grid = Grid.__new__(Grid)
+        grid.CELLS_PER_INT = self.CELLS_PER_INT
+        grid.width = self.width
+        grid.height = self.height
         grid.data = self.data
+        grid._summary = self._summary
         return grid
 
     def count(self, item=True):
-        return sum([x.count(item) for x in self.data])
+        # Cells are booleans, so only values equal to True or False (1, 0, ...) are counted
+        if item not in (True, False):
+            return 0
+        if bool(item):
+            return self._summary[0]
+        return self.width * self.height - self._summary[0]
 
     def asList(self, key=True):
+        if key not in (True, False):
+            return []
+        value = 1 if key else 0
         point_list = []
-        for x in range(self.width):
-            for y in range(self.height):
-                if self[x][y] == key: point_list.append((x, y))
+        for x, column in enumerate(self.data):
+            y = column.find(value)
+            while y != -1:
+                point_list.append((x, y))
+                y = column.find(value, y + 1)
         return point_list
 
     def packBits(self):
@@ -247,19 +338,14 @@ class Grid:
         Returns an efficient int list representation
 
         (width, height, bitPackedInts...)
+
+        Each int holds CELLS_PER_INT cells, the first one in its most
+        significant bit.
         """
-        bits = [self.width, self.height]
-        currentInt = 0
-        for i in range(self.height * self.width):
-            bit = self.CELLS_PER_INT - (i % self.CELLS_PER_INT) - 1
-            x, y = self._cellIndexToPosition(i)
-            if self[x][y]:
-                currentInt += 2 ** bit
-            if (i + 1) % self.CELLS_PER_INT == 0:
-                bits.append(currentInt)
-                currentInt = 0
-        bits.append(currentInt)
-        return tuple(bits)
+        size = self.CELLS_PER_INT
+        cells = b''.join(self.data).translate(_BYTES_TO_DIGITS)
+        cells += b'0' * (size - len(cells) % size)
+        return (self.width, self.height) + tuple([int(cells[i:i + size], 2) for i in range(0, len(cells), size)])
 
     def _cellIndexToPosition(self, index):
         x = index // self.height
@@ -270,25 +356,147 @@ class Grid:
         """
         Fills in data from a bit-level representation
         """
-        cell = 0
+        size = self.CELLS_PER_INT
         for packed in bits:
-            for bit in self._unpackInt(packed, self.CELLS_PER_INT):
-                if cell == self.width * self.height: break
-                x, y = self._cellIndexToPosition(cell)
-                self[x][y] = bit
-                cell += 1
-
-    def _unpackInt(self, packed, size):
-        bools = []
-        if packed < 0: raise ValueError("must be a positive integer")
-        for i in range(size):
-            n = 2 ** (self.CELLS_PER_INT - i - 1)
-            if packed >= n:
-                bools.append(True)
-                packed -= n
-            else:
-                bools.append(False)
-        return bools
+            if packed < 0: raise ValueError("must be a positive integer")
+        digits = ''.join([format(packed, '0%db' % size)[-size:] for packed in bits])
+        cells = digits.encode()[:self.width * self.height].translate(_DIGITS_TO_BYTES)
+        self._setCells(cells)
+
+    def _setCells(self, cells):
+        """
+        Overwrites the grid with 'cells', one 0/1 byte per cell in cell index
+        order; cells beyond the end of 'cells' are left unchanged.
+        """
+        height = self.height
+        columns = [bytearray(column) for column in self.data]
+        for x in range(self.width):
+            column = cells[x * height:(x + 1) * height]
+            columns[x][:len(column)] = column
+        self._setColumns(columns)
+
+    def asInt(self):
+        """
+        Returns the grid as one int whose bit x * height + y holds cell (x, y),
+        the same encoding BitGrid uses.
+        """
+        cells = b''.join(self.data)
+        if not cells: return 0
+        return int(cells[::-1].translate(_BYTES_TO_DIGITS), 2)
+
+    @staticmethod
+    def fromInt(width, height, bits):
+        """Builds a Grid from the encoding returned by asInt"""
+        grid = Grid(width, height)
+        if width * height:
+            digits = format(bits, '0%db' % (width * height))[::-1]
+            grid._setCells(digits.encode()[:width * height].translate(_DIGITS_TO_BYTES))
+        return grid
+
+    def toBytes(self):
+        """Returns the asInt encoding as little-endian bytes (one bit per cell)"""
+        return self.asInt().to_bytes((self.width * self.height + 7) // 8, 'little')
+
+    @staticmethod
+    def fromBytes(width, height, data):
+        """Builds a Grid from the output of toBytes"""
+        return Grid.fromInt(width, height, int.from_bytes(data, 'little'))
+
+
+# Translation tables between 0/1 cell bytes and '0'/'1' digits
+_BYTES_TO_DIGITS = bytes.maketrans(b'\x00\x01', b'01')
+_DIGITS_TO_BYTES = bytes.maketrans(b'01', b'\x00\x01')
+
+
+class BitGrid:
+    """
+    An immutable boolean grid packed into a single int, where bit
+    x * height + y holds cell (x, y).  It supports the read side of the Grid
+    interface (grid[x][y], count, asList, ==, hashing) with O(1) hashing and
+    cheap single-cell updates, which makes it a good search state component.
+    Cells are changed by building a new grid with BitGrid.without; copy and
+    deepCopy return a mutable Grid.
+    """
+
+    __slots__ = ('width', 'height', 'bits')
+
+    def __init__(self, width, height, bits=0):
+        self.width = width
+        self.height = height
+        self.bits = bits
+
+    @staticmethod
+    def fromGrid(grid):
+        return BitGrid(grid.width, grid.height, grid.asInt())
+
+    def __getitem__(self, x):
+        if x < 0:
+            x += self.width
+        if not 0 <= x < self.width:
+            raise IndexError('BitGrid index out of range')
+        return _BitGridColumn(self.bits >> (x * self.height), self.height)
+
+    def __str__(self):
+        out = [[str(self[x][y])[0] for x in range(self.width)] for y in range(self.height)]
+        out.reverse()
+        return '\n'.join([''.join(x) for x in out])
+
+    def __eq__(self, other):
+        if not isinstance(other, BitGrid): return False
+        return self.bits == other.bits and self.width == other.width and self.height == other.height
+
+    def __hash__(self):
+        return hash(self.bits)
+
+    def without(self, x, y):
+        """Returns a grid equal to this one with cell (x, y) set to False"""
+        bit = 1 << (x * self.height + y)
+        if not self.bits & bit:
+            return self
+        return BitGrid(self.width, self.height, self.bits & ~bit)
+
+    def copy(self):
+        return self.asGrid()
+
+    def deepCopy(self):
+        return self.asGrid()
+
+    def shallowCopy(self):
+        return self
+
+    def count(self, item=True):
+        trueCount = self.bits.bit_count()
+        return trueCount if item else self.width * self.height - trueCount
+
+    def asList(self, key=True):
+        bits = self.bits if key else ~self.bits & ((1 << (self.width * self.height)) - 1)
+        point_list = []
+        while bits:
+            lowest = bits & -bits
+            index = lowest.bit_length() - 1
+            point_list.append((index // self.height, index % self.height))
+            bits ^= lowest
+        return point_list
+
+    def asGrid(self):
+        return Grid.fromInt(self.width, self.height, self.bits)
+
+
+class _BitGridColumn:
+    """One column of a BitGrid, as returned by BitGrid[x]"""
+
+    __slots__ = ('bits', 'height')
+
+    def __init__(self, bits, height):
+        self.bits = bits
+        self.height = height
+
+    def __getitem__(self, y):
+        if y < 0:
+            y += self.height
+        if not 0 <= y < self.height:
+            raise IndexError('BitGrid index out of range')
+        return bool(self.bits >> y & 1)
 
 
 def reconstituteGrid(bitRep):
@@ -347,8 +555,22 @@ class Actions:
         dx, dy = Actions._directions[direction]
         return dx * speed, dy * speed
 
+    @staticmethod
+    def getMoveTable(walls):
+        """
+        Returns the MoveTable of 'walls', building it on first use.
+
+        Tables are cached by walls contents (see WallsCache), so every game
+        on a layout shares one.
+        """
+        return _MOVE_TABLES.get(walls)
+
     @staticmethod
     def getPossibleActions(config, walls):
+        actions = Actions.getMoveTable(walls).getActions(config.pos)
+        if actions is not None:
+            return list(actions)
+
         possible = []
         x, y = config.pos
         x_int, y_int = int(x + 0.5), int(y + 0.5)
@@ -365,6 +587,10 @@ class Actions:
 
     @staticmethod
     def getLegalNeighbors(position, walls):
+        neighbors = Actions.getMoveTable(walls).getNeighbors(position)
+        if neighbors is not None:
+            return neighbors
+
         x, y = position
         x_int, y_int = int(x + 0.5), int(y + 0.5)
         neighbors = []
@@ -383,22 +609,242 @@ class Actions:
         return x + dx, y + dy
 
 
-class GameStateData:
+class MoveTable:
+    """
+    The legal moves from every open cell of a walls Grid, computed once so that
+    agents and search problems look them up instead of probing the walls.
+
+    Each open cell only stores a bitmask of its open neighbours, one byte of
+    'masks' (indexed x * height + y like BitGrid); the tuples of moves are
+    shared by all the cells with the same mask.  For an open (x, y) cell:
+
+      getActions(cell):        the legal directions, STOP included, in the
+                               order of Actions.getPossibleActions
+      getForwardActions(cell, direction):
+                               the legal directions of an agent moving in
+                               'direction' that cannot stop and only turns
+                               around at dead ends (ghosts)
+      getNeighbors(cell):      the result of Actions.getLegalNeighbors
+      successors[cell]:        ((nextCell, direction), ...) for the legal
+                               moves to a neighbour cell, in NORTH, SOUTH,
+                               EAST, WEST order like the search problems'
+                               getSuccessors (built on first use; cells that
+                               are not open have none)
+
+    The getters return None for walls, cells off the grid and positions
+    between cells, which callers handle by probing the walls.  getCorridor
+    follows a move along a corridor, memoizing the walks.  Use
+    Actions.getMoveTable(walls) to get the shared table of a walls Grid.
     """
 
+    SEARCH_ORDER = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]
+    WALL = 0xFF
+
+    # Moves shared by the cells whose open neighbours have the same mask
+    # (bit i set when the move SEARCH_ORDER[i] is legal), filled in below
+    _ACTIONS = []
+    _FORWARD_ACTIONS = []
+    _SEARCH_MOVES = []
+
+    def __init__(self, walls):
+        self.width, self.height = width, height = walls.width, walls.height
+        self.masks = masks = bytearray([MoveTable.WALL]) * (width * height)
+        # Cells off the grid count as walls
+        columns = [[1] * height] + [walls[x] for x in range(width)] + [[1] * height]
+        for x in range(width):
+            west, column, east = columns[x], columns[x + 1], columns[x + 2]
+            for y in range(height):
+                if column[y]:
+                    continue
+                # Bits of the NORTH, SOUTH, EAST and WEST moves (see SEARCH_ORDER)
+                masks[x * height + y] = ((y + 1 < height and not column[y + 1])
+                                         | (y > 0 and not column[y - 1]) << 1
+                                         | (not east[y]) << 2
+                                         | (not west[y]) << 3)
+        self._successors = None
+        self.corridors = {}
+
+    @staticmethod
+    def _buildMoves():
+        vectors = Actions._directions
+        for mask in range(16):
+            legal = {direction for bit, direction in enumerate(MoveTable.SEARCH_ORDER) if mask >> bit & 1}
+            actions = tuple([direction for direction in vectors if direction == Directions.STOP or direction in legal])
+            moving = tuple([direction for direction in actions if direction != Directions.STOP])
+            forward = {}
+            for direction in vectors:
+                reverse = Actions.reverseDirection(direction)
+                if reverse in moving and len(moving) > 1:
+                    forward[direction] = tuple([action for action in moving if action != reverse])
+                else:
+                    forward[direction] = moving
+            MoveTable._ACTIONS.append(actions)
+            MoveTable._FORWARD_ACTIONS.append(forward)
+            MoveTable._SEARCH_MOVES.append(tuple([(direction, vectors[direction])
+                                                  for direction in MoveTable.SEARCH_ORDER if direction in legal]))
+
+    def getMask(self, cell):
+        """Returns the mask of the open cell 'cell', or WALL for any other position"""
+        x, y = cell
+        xInt, yInt = int(x), int(y)
+        if xInt != x or yInt != y or not (0 <= xInt < self.width and 0 <= yInt < self.height):
+            return MoveTable.WALL
+        return self.masks[xInt * self.height + yInt]
+
+    def getActions(self, cell):
+        mask = self.getMask(cell)
+        return None if mask == MoveTable.WALL else MoveTable._ACTIONS[mask]
+
+    def getForwardActions(self, cell, direction):
+        mask = self.getMask(cell)
+        return None if mask == MoveTable.WALL else MoveTable._FORWARD_ACTIONS[mask][direction]
+
+    def getNeighbors(self, cell):
+        mask = self.getMask(cell)
+        if mask == MoveTable.WALL:
+            return None
+        x, y = int(cell[0]), int(cell[1])
+        vectors = Actions._directions
+        return [(x + vectors[direction][0], y + vectors[direction][1]) for direction in MoveTable._ACTIONS[mask]]
+
+    @property
+    def successors(self):
+        if self._successors is None:
+            successors = _NoSuccessors()
+            height = self.height
+            for index, mask in enumerate(self.masks):
+                if mask != MoveTable.WALL:
+                    x, y = divmod(index, height)
+                    successors[(x, y)] = tuple([((x + dx, y + dy), direction)
+                                                for direction, (dx, dy) in MoveTable._SEARCH_MOVES[mask]])
+            self._successors = successors
+        return self._successors
+
+    def getCorridor(self, cell, direction):
+        """
+        Follows the legal move 'direction' from 'cell' and then the corridor
+        it enters (cells with exactly two exits) without turning back.
+        Returns (cells, directions): the cells entered, ending at the first
+        junction or dead end (or at 'cell' again on a loop), and the move
+        into each of them.
+        """
+        key = (cell, direction)
+        corridor = self.corridors.get(key)
+        if corridor is None:
+            corridor = self.corridors[key] = self._walkCorridor(cell, direction)
+        return corridor
+
+    def _walkCorridor(self, cell, direction):
+        start = x, y = int(cell[0]), int(cell[1])
+        cells, directions = [], []
+        while True:
+            dx, dy = Actions._directions[direction]
+            x, y = x + dx, y + dy
+            cells.append((x, y))
+            directions.append(direction)
+            if (x, y) == start:
+                break
+            exits = [exit for exit in self.getActions((x, y)) if exit != Directions.STOP]
+            if len(exits) != 2:
+                break
+            direction = exits[1] if exits[0] == Actions.reverseDirection(direction) else exits[0]
+        return tuple(cells), tuple(directions)
+
+
+MoveTable._buildMoves()
+
+
+class _NoSuccessors(dict):
+    """The successors of a MoveTable: cells that are not open have none"""
+
+    def __missing__(self, cell):
+        return ()
+
+
+class WallsCache:
+    """
+    Values computed from a walls Grid, shared by every Grid with the same
+    contents.
+
+    Values are kept by walls contents (keyed by a private copy), up to the
+    maxSize most recently used ones.  Repeated lookups with the same Grid
+    object skip hashing its contents through an entry by object, which is
+    only trusted while the Grid's hash is unchanged (so a mutated Grid gets
+    the value of its new contents) and which only holds a weak reference to
+    the Grid.
+    """
+
+    def __init__(self, build, maxSize=None):
+        self.build = build
+        self.maxSize = maxSize
+        self._byContents = collections.OrderedDict()
+        self._byId = {}
+
+    def get(self, walls):
+        """Returns the value for 'walls', building it on first use."""
+        entry = self._byId.get(id(walls))
+        if entry is not None and entry[0]() is walls and entry[1] == hash(walls):
+            return entry[2]
+        value = self._byContents.get(walls)
+        if value is None:
+            value = self.build(walls)
+            self._store(walls, value)
+        else:
+            self._byContents.move_to_end(walls)
+        self._remember(walls, value)
+        return value
+
+    def put(self, walls, value):
+        """Replaces the value for the contents of 'walls'."""
+        self._store(walls, value)
+        self._remember(walls, value)
+
+    def _store(self, walls, value):
+        byContents = self._byContents
+        byContents.pop(walls, None)
+        byContents[walls.copy()] = value
+        if self.maxSize is not None and len(byContents) > self.maxSize:
+            byContents.popitem(last=False)
+
+    def _remember(self, walls, value):
+        key = id(walls)
+        byId = self._byId
+
+        def forget(reference):
+            if byId.get(key, (None,))[0] is reference:
+                del byId[key]
+
+        byId[key] = (weakref.ref(walls, forget), hash(walls), value)
+
+
+# Move tables shared by walls contents (see Actions.getMoveTable)
+_MOVE_TABLES = WallsCache(MoveTable, maxSize=64)
+
+
+class GameStateData:
+    """
+    The data of a game state.  Successors share their food Grid, capsule list
+    and AgentStates with their predecessor (copy-on-write): whoever changes
+    one of them must first replace it with a copy, e.g. through
+    getWritableAgentState, so only the changed pieces are ever copied.
     """
 
+    __slots__ = ('food', 'capsules', 'agentStates', 'layout', '_eaten', 'score', '_writableAgents', '_foodEaten',
+                 '_foodAdded', '_capsuleEaten', '_agentMoved', '_lose', '_win', 'scoreChange')
+
     def __init__(self, prevState=None):
         """
-        Generates a new data packet by copying information from its predecessor.
+        Generates a new data packet that shares the information of its predecessor.
         """
         if prevState is not None:
-            self.food = prevState.food.shallowCopy()
-            self.capsules = prevState.capsules[:]
-            self.agentStates = self.copyAgentStates(prevState.agentStates)
+            self.food = prevState.food
+            self.capsules = prevState.capsules
+            self.agentStates = prevState.agentStates[:]
             self.layout = prevState.layout
             self._eaten = prevState._eaten
             self.score = prevState.score
+        # Bit i is set once agentStates[i] is a private copy of this state
+        self._writableAgents = 0
 
         self._foodEaten = None
         self._foodAdded = None
@@ -411,13 +857,27 @@ class GameStateData:
     def deepCopy(self):
         state = GameStateData(self)
         state.food = self.food.deepCopy()
-        state.layout = self.layout.deepCopy()
+        state.capsules = self.capsules[:]
+        state.agentStates = self.copyAgentStates(self.agentStates)
+        state._writableAgents = (1 << len(state.agentStates)) - 1
+        state._eaten = self._eaten[:]
+        state.layout = self.layout  # Layouts are immutable and shared
         state._agentMoved = self._agentMoved
         state._foodEaten = self._foodEaten
         state._foodAdded = self._foodAdded
         state._capsuleEaten = self._capsuleEaten
         return state
 
+    def getWritableAgentState(self, index):
+        """
+        Returns agentStates[index] ready to be modified, copying it first if it
+        is still shared with another state.
+        """
+        if not self._writableAgents >> index & 1:
+            self.agentStates[index] = self.agentStates[index].copy()
+            self._writableAgents |= 1 << index
+        return self.agentStates[index]
+
     @staticmethod
     def copyAgentStates(agentStates):
         copiedStates = []
@@ -451,13 +911,10 @@ class GameStateData:
 
     def __str__(self):
         width, height = self.layout.width, self.layout.height
-        map_grid = Grid(width, height)
         if isinstance(self.food, tuple):
             self.food = reconstituteGrid(self.food)
-        for x in range(width):
-            for y in range(height):
-                food, walls = self.food, self.layout.walls
-                map_grid[x][y] = self._foodWallStr(food[x][y], walls[x][y])
+        food, walls = self.food, self.layout.walls
+        map_grid = [[self._foodWallStr(food[x][y], walls[x][y]) for y in range(height)] for x in range(width)]
 
         for agentState in self.agentStates:
             if agentState is None: continue
@@ -472,7 +929,10 @@ class GameStateData:
         for x, y in self.capsules:
             map_grid[x][y] = 'o'
 
-        return f"{map_grid}\nScore: {self.score}\n"
+        rows = [''.join([map_grid[x][y] for x in range(width)]) for y in range(height)]
+        rows.reverse()
+        board = '\n'.join(rows)
+        return f"{board}\nScore: {self.score}\n"
 
     @staticmethod
     def _foodWallStr(hasFood, hasWall):
@@ -497,6 +957,110 @@ class GameStateData:
     def _ghostStr(direction):
         return 'G'
 
+    # Compact binary snapshots (toBytes / fromBytes)
+    SNAPSHOT_MAGIC = b'PMS'
+    SNAPSHOT_VERSION = 1
+    _SNAPSHOT_HEADER = struct.Struct('<3sBHHdBBH')  # magic, version, width, height, score, flags, agents, capsules
+    _SNAPSHOT_AGENT = struct.Struct('<BddBddBiii')  # flags, pos, direction, start pos, start direction, timers
+    _SNAPSHOT_CAPSULE = struct.Struct('<HH')
+    _SNAPSHOT_DIRECTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST, Directions.STOP]
+    _SNAPSHOT_WIN, _SNAPSHOT_LOSE, _SNAPSHOT_LAYOUT, _SNAPSHOT_INT_SCORE = 1, 2, 4, 8
+    _SNAPSHOT_PACMAN, _SNAPSHOT_CONFIGURATION, _SNAPSHOT_EATEN, _SNAPSHOT_INT_POSITION, _SNAPSHOT_INT_START = 1, 2, 4, 8, 16
+
+    def toBytes(self, includeLayout=False):
+        """
+        Returns a compact, versioned binary snapshot of this state: score,
+        win/lose flags, agent states, capsules and the food bits.  The layout
+        is only referenced by its size unless includeLayout is set, in which
+        case its text is stored too and fromBytes needs no layout.
+        """
+        directions = self._SNAPSHOT_DIRECTIONS
+        flags = (self._win and self._SNAPSHOT_WIN) | (self._lose and self._SNAPSHOT_LOSE) | (includeLayout and self._SNAPSHOT_LAYOUT)
+        if type(self.score) is int: flags |= self._SNAPSHOT_INT_SCORE
+        parts = [self._SNAPSHOT_HEADER.pack(self.SNAPSHOT_MAGIC, self.SNAPSHOT_VERSION, self.food.width, self.food.height,
+                                            self.score, flags, len(self.agentStates), len(self.capsules))]
+        for index, agentState in enumerate(self.agentStates):
+            configuration, start = agentState.configuration, agentState.start
+            agentFlags = agentState.isPacman and self._SNAPSHOT_PACMAN
+            if self._eaten[index]: agentFlags |= self._SNAPSHOT_EATEN
+            x, y, direction = 0, 0, Directions.STOP
+            if configuration is not None:
+                agentFlags |= self._SNAPSHOT_CONFIGURATION
+                (x, y), direction = configuration.pos, configuration.direction
+                if _isIntPosition(configuration.pos): agentFlags |= self._SNAPSHOT_INT_POSITION
+            (startX, startY), startDirection = start.pos, start.direction
+            if _isIntPosition(start.pos): agentFlags |= self._SNAPSHOT_INT_START
+            parts.append(self._SNAPSHOT_AGENT.pack(agentFlags, x, y, directions.index(direction), startX, startY,
+                                                   directions.index(startDirection), agentState.scaredTimer,
+                                                   agentState.numCarrying, agentState.numReturned))
+        for capsule in self.capsules:
+            parts.append(self._SNAPSHOT_CAPSULE.pack(*capsule))
+        parts.append(self.food.toBytes())
+        if includeLayout:
+            parts.append('\n'.join(self.layout.layoutText).encode())
+        return b''.join(parts)
+
+    @staticmethod
+    def fromBytes(data, layout=None):
+        """
+        Rebuilds a GameStateData from a toBytes snapshot.  'layout' must be
+        given when the snapshot does not include its own layout.
+        """
+        cls = GameStateData
+        if data[:3] != cls.SNAPSHOT_MAGIC:
+            raise ValueError("not a game state snapshot")
+        magic, version, width, height, score, flags, numAgents, numCapsules = cls._SNAPSHOT_HEADER.unpack_from(data)
+        if version != cls.SNAPSHOT_VERSION:
+            raise ValueError("unsupported game state snapshot version %d" % version)
+        offset = cls._SNAPSHOT_HEADER.size
+
+        directions = cls._SNAPSHOT_DIRECTIONS
+        agentStates, eaten = [], []
+        for _ in range(numAgents):
+            agentFlags, x, y, direction, startX, startY, startDirection, scaredTimer, numCarrying, numReturned = \
+                cls._SNAPSHOT_AGENT.unpack_from(data, offset)
+            offset += cls._SNAPSHOT_AGENT.size
+            start = (int(startX), int(startY)) if agentFlags & cls._SNAPSHOT_INT_START else (startX, startY)
+            agentState = AgentState(Configuration(start, directions[startDirection]), bool(agentFlags & cls._SNAPSHOT_PACMAN))
+            agentState.configuration = None
+            if agentFlags & cls._SNAPSHOT_CONFIGURATION:
+                position = (int(x), int(y)) if agentFlags & cls._SNAPSHOT_INT_POSITION else (x, y)
+                agentState.configuration = Configuration(position, directions[direction])
+            agentState.scaredTimer = scaredTimer
+            agentState.numCarrying = numCarrying
+            agentState.numReturned = numReturned
+            agentStates.append(agentState)
+            eaten.append(bool(agentFlags & cls._SNAPSHOT_EATEN))
+
+        capsules = []
+        for _ in range(numCapsules):
+            capsules.append(cls._SNAPSHOT_CAPSULE.unpack_from(data, offset))
+            offset += cls._SNAPSHOT_CAPSULE.size
+
+        foodSize = (width * height + 7) // 8
+        food = Grid.fromBytes(width, height, data[offset:offset + foodSize])
+        offset += foodSize
+
+        if flags & cls._SNAPSHOT_LAYOUT:
+            import layout as layoutModule
+            layout = layoutModule.internLayout(data[offset:].decode().split('\n'))
+        if layout is None:
+            raise ValueError("the snapshot does not include its layout; one must be given")
+        if (layout.width, layout.height) != (width, height):
+            raise ValueError("the layout does not match the snapshot size")
+
+        state = GameStateData()
+        state.food = food
+        state.capsules = capsules
+        state.agentStates = agentStates
+        state._writableAgents = (1 << numAgents) - 1
+        state._eaten = eaten
+        state.layout = layout
+        state.score = int(score) if flags & cls._SNAPSHOT_INT_SCORE else score
+        state._win = bool(flags & cls._SNAPSHOT_WIN)
+        state._lose = bool(flags & cls._SNAPSHOT_LOSE)
+        return state
+
     def initialize(self, layout, numGhostAgents):
         """
         Creates an initial game state from a layout array (see layout.py).
@@ -517,9 +1081,15 @@ class GameStateData:
                 else:
                     numGhosts += 1
             self.agentStates.append(AgentState(Configuration(pos, Directions.STOP), isPacman))
+        self._writableAgents = (1 << len(self.agentStates)) - 1
         self._eaten = [False] * len(self.agentStates)
 
 
+def _isIntPosition(pos):
+    """Snapshots store coordinates as doubles and remember which were ints"""
+    return type(pos[0]) is int and type(pos[1]) is int
+
+
 class Game:
     """
     The Game manages the control flow, soliciting actions from agents.
@@ -527,7 +1097,8 @@ class Game:
     OLD_STDOUT = None
     OLD_STDERR = None
 
-    def __init__(self, agents, display, rules, startingIndex=0, muteAgents=False, catchExceptions=False):
+    def __init__(self, agents, display, rules, startingIndex=0, muteAgents=False, catchExceptions=False,
+                 explorationTracker=None):
         self.numMoves = 0
         self.agentCrashed = False
         self.agents = agents
@@ -544,6 +1115,7 @@ class Game:
         import io
         self.agentOutput = [io.StringIO() for _ in agents]
         self.state = None
+        self.explorationTracker = explorationTracker
 
     def getProgress(self):
         if self.gameOver:
@@ -573,8 +1145,21 @@ class Game:
 
     def run(self):
         """
-        Main control loop for game play.
+        Main control loop for game play.  The game's explorationTracker, if
+        any, records the states explored during this game only.
         """
+        tracker = self.explorationTracker
+        if tracker is None:
+            return self._run()
+        stateClass = type(self.state)
+        previous = stateClass.explorationTracker
+        stateClass.setExplorationTracker(tracker)
+        try:
+            return self._run()
+        finally:
+            stateClass.setExplorationTracker(previous)
+
+    def _run(self):
         self.display.initialize(self.state.data)
         self.numMoves = 0
 
@@ -14,7 +14,7 @@
 
 import util
 from game import Actions, Agent, Directions
-from util import manhattanDistance
+from util import manhattanDistances
 
 
 class GhostAgent(Agent):
@@ -68,7 +68,7 @@ class DirectionalGhost(GhostAgent):
         pacmanPosition = state.getPacmanPosition()
 
         # Select best actions given the state
-        distancesToPacman = [manhattanDistance(pos, pacmanPosition) for pos in newPositions]
+        distancesToPacman = manhattanDistances(pacmanPosition, newPositions)
         if isScared:
             bestScore = max(distancesToPacman)
             bestProb = self.prob_scaredFlee
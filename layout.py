@@ -12,18 +12,25 @@
 # Pieter Abbeel (pabbeel@cs.berkeley.edu).
 
 
-from util import manhattanDistance
+from util import manhattanDistances
+from game import Actions
+from game import Directions
 from game import Grid
 import os
 import random
-from functools import reduce
+from array import array
 
 VISIBILITY_MATRIX_CACHE = {}
+LAYOUT_CACHE = {}
 
 
 class Layout:
     """
     A Layout manages the static information about the game board.
+
+    Layouts are immutable once built: game states reference them and never
+    copy them, and layouts built with internLayout are shared by every game
+    on the same board.
     """
 
     def __init__(self, layoutText):
@@ -36,33 +43,22 @@ class Layout:
         self.numGhosts = 0
         self.processLayoutText(layoutText)
         self.layoutText = layoutText
-        self.totalFood = len(self.food.asList())
-        self.visibility = None
-        # self.initializeVisibilityMatrix()
+        self.totalFood = self.food.count()
+        Actions.getMoveTable(self.walls)  # Warm the shared move table of these walls
+        self.visibility = None  # Built on first use by initializeVisibilityMatrix
 
     def getNumGhosts(self):
         return self.numGhosts
 
     def initializeVisibilityMatrix(self):
-        global VISIBILITY_MATRIX_CACHE
-        if reduce(str.__add__, self.layoutText) not in VISIBILITY_MATRIX_CACHE:
-            from game import Directions
-            vecs = [(-0.5, 0), (0.5, 0), (0, -0.5), (0, 0.5)]
-            dirs = [Directions.NORTH, Directions.SOUTH, Directions.WEST, Directions.EAST]
-            vis = Grid(self.width, self.height, {Directions.NORTH: set(), Directions.SOUTH: set(), Directions.EAST: set(), Directions.WEST: set(), Directions.STOP: set()})
-            for x in range(self.width):
-                for y in range(self.height):
-                    if not self.walls[x][y]:
-                        for vec, direction in zip(vecs, dirs):
-                            dx, dy = vec
-                            nextx, nexty = x + dx, y + dy
-                            while (nextx + nexty) != int(nextx) + int(nexty) or not self.walls[int(nextx)][int(nexty)]:
-                                vis[x][y][direction].add((nextx, nexty))
-                                nextx, nexty = x + dx, y + dy
-            self.visibility = vis
-            VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)] = vis
-        else:
-            self.visibility = VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)]
+        """
+        Sets self.visibility to the VisibilityMatrix of the walls, shared by
+        every layout with the same walls.
+        """
+        visibility = VISIBILITY_MATRIX_CACHE.get(self.walls)
+        if visibility is None:
+            visibility = VISIBILITY_MATRIX_CACHE[self.walls.copy()] = VisibilityMatrix(self.walls)
+        self.visibility = visibility
 
     def isWall(self, pos):
         x, col = pos
@@ -82,18 +78,27 @@ class Layout:
 
     def getFurthestCorner(self, pacPos):
         poses = [(1, 1), (1, self.height - 2), (self.width - 2, 1), (self.width - 2, self.height - 2)]
-        dist, pos = max([(manhattanDistance(p, pacPos), p) for p in poses])
+        dist, pos = max(zip(manhattanDistances(pacPos, poses), poses))
         return pos
 
     def isVisibleFrom(self, ghostPos, pacPos, pacDirection):
-        row, col = [int(x) for x in pacPos]
-        return ghostPos in self.visibility[row][col][pacDirection]
+        if self.visibility is None:
+            self.initializeVisibilityMatrix()
+        return self.visibility.isVisibleFrom(ghostPos, pacPos, pacDirection)
 
     def __str__(self):
         return "\n".join(self.layoutText)
 
+    def __getstate__(self):
+        # The visibility matrix is shared by walls and rebuilt on demand, so
+        # recorded games do not carry it
+        state = dict(self.__dict__)
+        state['visibility'] = None
+        return state
+
     def deepCopy(self):
-        return Layout(self.layoutText[:])
+        # Layouts are immutable, so a copy can share everything with the original.
+        return self
 
     def processLayoutText(self, layoutText):
         """
@@ -133,6 +138,82 @@ class Layout:
             self.numGhosts += 1
 
 
+class VisibilityMatrix:
+    """
+    What Pacman can see from each open cell of a board, looking in each
+    direction: the positions along the ray, in half steps, up to the first
+    wall.  Looking in the Stop direction shows nothing.
+
+    The rays are stored as run lengths: runs[direction][x * height + y] is the
+    number of open cells between (x, y) and the first wall in that direction.
+    """
+
+    def __init__(self, walls):
+        self.width = walls.width
+        self.height = walls.height
+        self.runs = {direction: array('H', bytes(2 * self.width * self.height))
+                     for direction in (Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST)}
+
+        # Each run extends the run of the next cell in its direction, so one
+        # sweep against the direction fills a whole row or column
+        height = self.height
+        north, south = self.runs[Directions.NORTH], self.runs[Directions.SOUTH]
+        for x in range(self.width):
+            column = walls[x]
+            for y in range(height - 2, -1, -1):
+                if not column[y + 1]:
+                    north[x * height + y] = north[x * height + y + 1] + 1
+            for y in range(1, height):
+                if not column[y - 1]:
+                    south[x * height + y] = south[x * height + y - 1] + 1
+        east, west = self.runs[Directions.EAST], self.runs[Directions.WEST]
+        for y in range(height):
+            for x in range(self.width - 2, -1, -1):
+                if not walls[x + 1][y]:
+                    east[x * height + y] = east[(x + 1) * height + y] + 1
+            for x in range(1, self.width):
+                if not walls[x - 1][y]:
+                    west[x * height + y] = west[(x - 1) * height + y] + 1
+
+    def getRun(self, pos, direction):
+        """
+        Returns the number of open cells seen from the cell 'pos' looking in
+        'direction' before the view hits a wall.
+        """
+        if direction not in self.runs:
+            return 0
+        x, y = pos
+        return self.runs[direction][x * self.height + y]
+
+    def getVisiblePositions(self, pos, direction):
+        """
+        Returns the set of positions seen from the cell 'pos' looking in
+        'direction', in half steps up to the one next to the wall.
+        """
+        dx, dy = Actions.directionToVector(direction, 0.5)
+        x, y = pos
+        return {(x + dx * step, y + dy * step) for step in range(1, 2 * self.getRun(pos, direction) + 2)}
+
+    def isVisibleFrom(self, ghostPos, pacPos, pacDirection):
+        """
+        Whether Pacman, on (or moving out of) the cell of pacPos and looking
+        in pacDirection, sees a ghost at ghostPos.
+        """
+        if pacDirection not in self.runs:
+            return False
+        x, y = [int(coordinate) for coordinate in pacPos]
+        ghostX, ghostY = ghostPos
+        if pacDirection == Directions.NORTH or pacDirection == Directions.SOUTH:
+            ahead = ghostY - y if pacDirection == Directions.NORTH else y - ghostY
+            aside = ghostX - x
+        else:
+            ahead = ghostX - x if pacDirection == Directions.EAST else x - ghostX
+            aside = ghostY - y
+        if aside != 0 or ahead <= 0 or 2 * ahead != int(2 * ahead):
+            return False
+        return ahead <= self.getRun((x, y), pacDirection) + 0.5
+
+
 def getLayout(name, back=2):
     if name.endswith('.lay'):
         layout = tryToLoad('layouts/' + name)
@@ -152,6 +233,18 @@ def tryToLoad(fullname):
     if not os.path.exists(fullname): return None
     f = open(fullname)
     try:
-        return Layout([line.strip() for line in f])
+        return internLayout([line.strip() for line in f])
     finally:
         f.close()
+
+
+def internLayout(layoutText):
+    """
+    Returns the shared Layout for the given lines of layout text, parsing the
+    text only the first time it is seen.
+    """
+    key = tuple(layoutText)
+    layout = LAYOUT_CACHE.get(key)
+    if layout is None:
+        layout = LAYOUT_CACHE[key] = Layout(list(key))
+    return layout
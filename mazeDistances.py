@@ -0,0 +1,134 @@
+# mazeDistances.py
+# ----------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Exact maze distances between the open cells of a walls Grid.
+
+A MazeDistances oracle runs one breadth first search per open cell and keeps
+the results in a flat array, so a distance query is a single array lookup.
+Oracles are cached by walls layout and shared between calls and games:
+
+> distances = getMazeDistances(gameState.getWalls())
+> distances.getDistance((1, 1), (5, 6))
+"""
+
+from array import array
+
+from game import WallsCache
+
+# Boards with more open cells than this get a lazy (per source) table by
+# default: the full table costs one breadth first search per open cell up
+# front, a fraction of a second at this size but seconds on big mazes
+LAZY_THRESHOLD = 500
+
+_ORACLES = WallsCache(lambda walls: MazeDistances(walls, walls.width * walls.height - walls.count() > LAZY_THRESHOLD),
+                      maxSize=16)
+
+
+class MazeDistances:
+    """
+    Shortest path lengths between every pair of open cells of a walls Grid.
+
+    In the default (full) mode all the distances are computed up front into an
+    n x n array of unsigned shorts, n being the number of open cells.  In lazy
+    mode a row is only computed, and then kept, the first time a query starts
+    from its cell, which suits boards too big for the full table.
+    """
+
+    UNREACHABLE = 0xFFFF
+
+    def __init__(self, walls, lazy=False):
+        self.width = walls.width
+        self.height = walls.height
+        self.lazy = lazy
+        self.cells = [(x, y) for x in range(walls.width) for y in range(walls.height) if not walls[x][y]]
+        self.cellIndex = {cell: index for index, cell in enumerate(self.cells)}
+        self.neighbors = []
+        for x, y in self.cells:
+            adjacent = [(x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)]
+            self.neighbors.append([self.cellIndex[cell] for cell in adjacent if cell in self.cellIndex])
+
+        self.rows = {}
+        self.table = None
+        if not lazy:
+            size = len(self.cells)
+            self.table = array('H', bytes(2 * size * size))
+            for source in range(size):
+                self.table[source * size:(source + 1) * size] = self._search(source)
+            self._tableView = memoryview(self.table)
+
+    def _search(self, source):
+        """
+        Breadth first search from the cell with index 'source'; returns the
+        array of distances to every open cell.
+        """
+        distances = array('H', [MazeDistances.UNREACHABLE]) * len(self.cells)
+        distances[source] = 0
+        frontier = [source]
+        depth = 0
+        neighbors = self.neighbors
+        while frontier:
+            depth += 1
+            nextFrontier = []
+            for cell in frontier:
+                for neighbor in neighbors[cell]:
+                    if distances[neighbor] == MazeDistances.UNREACHABLE:
+                        distances[neighbor] = depth
+                        nextFrontier.append(neighbor)
+            frontier = nextFrontier
+        return distances
+
+    def getRow(self, source):
+        """
+        Returns the distances from the cell with index 'source' to every open
+        cell, indexed like self.cells, without copying them (a memoryview of
+        the full table or the array of a lazy row).
+        """
+        if self.table is not None:
+            size = len(self.cells)
+            return self._tableView[source * size:(source + 1) * size]
+        row = self.rows.get(source)
+        if row is None:
+            row = self.rows[source] = self._search(source)
+        return row
+
+    def getDistance(self, pos1, pos2):
+        """
+        Returns the maze distance between two open cells, or None if there is
+        no path between them.
+        """
+        source, target = self.cellIndex[pos1], self.cellIndex[pos2]
+        if self.table is not None:
+            distance = self.table[source * len(self.cells) + target]
+        else:
+            distance = self.getRow(source)[target]
+        return None if distance == MazeDistances.UNREACHABLE else distance
+
+    def isOpen(self, pos):
+        return pos in self.cellIndex
+
+
+def getMazeDistances(walls, lazy=None):
+    """
+    Returns the MazeDistances oracle for 'walls', building it on first use.
+
+    Oracles are cached by walls contents (see game.WallsCache), so every game
+    played on the same layout shares one table.  lazy=None picks lazy mode
+    for boards with more than LAZY_THRESHOLD open cells.
+    """
+    oracle = _ORACLES.get(walls)
+    if lazy is not None and oracle.lazy != lazy:
+        oracle = MazeDistances(walls, lazy)
+        _ORACLES.put(walls, oracle)
+    return oracle
@@ -39,12 +39,14 @@ code to run a game.  This file is divided into three sections:
 To play your first game, type 'python pacman.py' from the command line.
 The keys are 'a', 's', 'd', and 'w' to move (or arrow keys).  Have fun!
 """
+import collections
 import os
 import random
 import sys
 
 import layout
 from game import Actions
+from game import Configuration
 from game import Directions
 from game import Game
 from game import GameStateData
@@ -75,13 +77,23 @@ class GameState:
     # Accessor methods: use these to access state data #
     ####################################################
 
-    # static variable keeps track of which states have had getLegalActions called
-    explored = set()
+    # static variable: the ExplorationTracker told about every state passed to or
+    # returned by generateSuccessor.  Exploration is only tracked while one is
+    # installed (see setExplorationTracker); by default nothing is recorded.
+    explorationTracker = None
+
+    def setExplorationTracker(tracker):
+        GameState.explorationTracker = tracker
+
+    setExplorationTracker = staticmethod(setExplorationTracker)
 
     def getAndResetExplored():
-        tmp = GameState.explored.copy()
-        GameState.explored = set()
-        return tmp
+        tracker = GameState.explorationTracker
+        if tracker is None:
+            return set()
+        explored = tracker.getStates()
+        tracker.reset()
+        return explored
 
     getAndResetExplored = staticmethod(getAndResetExplored)
 
@@ -118,7 +130,7 @@ class GameState:
         if agentIndex == 0:
             state.data.scoreChange += -TIME_PENALTY  # Penalty for waiting around
         else:
-            GhostRules.decrementTimer(state.data.agentStates[agentIndex])
+            GhostRules.decrementTimer(state.data.getWritableAgentState(agentIndex))
 
         # Resolve multi-agent effects
         GhostRules.checkDeath(state, agentIndex)
@@ -126,8 +138,9 @@ class GameState:
         # Book keeping
         state.data._agentMoved = agentIndex
         state.data.score += state.data.scoreChange
-        GameState.explored.add(self)
-        GameState.explored.add(state)
+        if GameState.explorationTracker is not None:
+            GameState.explorationTracker.add(self)
+            GameState.explorationTracker.add(state)
         return state
 
     def getLegalPacmanActions(self):
@@ -180,6 +193,7 @@ class GameState:
         return self.data.capsules
 
     def getNumFood(self):
+        # O(1): the food Grid keeps a running count of its True cells
         return self.data.food.count()
 
     def getFood(self):
@@ -260,6 +274,48 @@ class GameState:
         self.data.initialize(layout, numGhostAgents)
 
 
+class ExplorationTracker:
+    """
+    Records the GameStates explored through GameState.generateSuccessor while
+    it is installed with GameState.setExplorationTracker.  Memory stays
+    bounded in every mode:
+
+      'count':  only counts the states; nothing is hashed or kept alive
+      'sample': keeps one state out of every sampleRate, up to maxSize states
+      'lru':    keeps the maxSize most recently seen distinct states
+    """
+
+    MODES = ('count', 'sample', 'lru')
+
+    def __init__(self, mode='count', maxSize=10000, sampleRate=100):
+        if mode not in ExplorationTracker.MODES:
+            raise Exception('Unknown exploration tracking mode ' + str(mode))
+        self.mode = mode
+        self.maxSize = maxSize
+        self.sampleRate = sampleRate
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.states = collections.OrderedDict()
+
+    def add(self, state):
+        self.count += 1
+        if self.mode == 'count':
+            return
+        if self.mode == 'sample':
+            if self.count % self.sampleRate == 0 and len(self.states) < self.maxSize:
+                self.states[state] = True
+            return
+        self.states[state] = True
+        self.states.move_to_end(state)
+        if len(self.states) > self.maxSize:
+            self.states.popitem(last=False)
+
+    def getStates(self):
+        return set(self.states)
+
+
 ############################################################################
 #                     THE HIDDEN SECRETS OF PACMAN                         #
 #                                                                          #
@@ -280,11 +336,17 @@ class ClassicGameRules:
     def __init__(self, timeout=30):
         self.timeout = timeout
 
-    def newGame(self, layout, pacmanAgent, ghostAgents, display, quiet=False, catchExceptions=False):
+    def newGame(self, layout, pacmanAgent, ghostAgents, display, quiet=False, catchExceptions=False,
+                explorationTracker=None):
+        """
+        explorationTracker: optional ExplorationTracker that records this game
+        only; it is installed while the game runs and the tracker installed
+        with GameState.setExplorationTracker, if any, is restored afterwards.
+        """
         agents = [pacmanAgent] + ghostAgents[:layout.getNumGhosts()]
         initState = GameState()
         initState.initialize(layout, len(ghostAgents))
-        game = Game(agents, display, self, catchExceptions=catchExceptions)
+        game = Game(agents, display, self, catchExceptions=catchExceptions, explorationTracker=explorationTracker)
         game.state = initState
         self.initialState = initState.deepCopy()
         self.quiet = quiet
@@ -354,7 +416,7 @@ class PacmanRules:
         if action not in legal:
             raise Exception("Illegal action " + str(action))
 
-        pacmanState = state.data.agentStates[0]
+        pacmanState = state.data.getWritableAgentState(0)
 
         # Update Configuration
         vector = Actions.directionToVector(action, PacmanRules.PACMAN_SPEED)
@@ -377,18 +439,17 @@ class PacmanRules:
             state.data.food = state.data.food.copy()
             state.data.food[x][y] = False
             state.data._foodEaten = position
-            # TODO: cache numFood?
             numFood = state.getNumFood()
             if numFood == 0 and not state.data._lose:
                 state.data.scoreChange += 500
                 state.data._win = True
         # Eat capsule
         if position in state.getCapsules():
-            state.data.capsules.remove(position)
+            state.data.capsules = [capsule for capsule in state.data.capsules if capsule != position]
             state.data._capsuleEaten = position
             # Reset all ghosts' scared timers
             for index in range(1, len(state.data.agentStates)):
-                state.data.agentStates[index].scaredTimer = SCARED_TIME
+                state.data.getWritableAgentState(index).scaredTimer = SCARED_TIME
 
     consume = staticmethod(consume)
 
@@ -405,6 +466,9 @@ class GhostRules:
         reach a dead end, but can turn 90 degrees at intersections.
         """
         conf = state.getGhostState(ghostIndex).configuration
+        forwardActions = Actions.getMoveTable(state.data.layout.walls).getForwardActions(conf.pos, conf.direction)
+        if forwardActions is not None:
+            return list(forwardActions)
         possibleActions = Actions.getPossibleActions(conf, state.data.layout.walls)
         reverse = Actions.reverseDirection(conf.direction)
         if Directions.STOP in possibleActions:
@@ -421,7 +485,7 @@ class GhostRules:
         if action not in legal:
             raise Exception("Illegal ghost action " + str(action))
 
-        ghostState = state.data.agentStates[ghostIndex]
+        ghostState = state.data.getWritableAgentState(ghostIndex)
         speed = GhostRules.GHOST_SPEED
         if ghostState.scaredTimer > 0: speed /= 2.0
         vector = Actions.directionToVector(action, speed)
@@ -432,7 +496,8 @@ class GhostRules:
     def decrementTimer(ghostState):
         timer = ghostState.scaredTimer
         if timer == 1:
-            ghostState.configuration.pos = nearestPoint(ghostState.configuration.pos)
+            configuration = ghostState.configuration
+            ghostState.configuration = Configuration(nearestPoint(configuration.pos), configuration.direction)
         ghostState.scaredTimer = max(0, timer - 1)
 
     decrementTimer = staticmethod(decrementTimer)
@@ -455,10 +520,12 @@ class GhostRules:
 
     def collide(state, ghostState, agentIndex):
         if ghostState.scaredTimer > 0:
+            ghostState = state.data.getWritableAgentState(agentIndex)
             state.data.scoreChange += 200
             GhostRules.placeGhost(state, ghostState)
             ghostState.scaredTimer = 0
             # Added for first-person
+            state.data._eaten = state.data._eaten[:]
             state.data._eaten[agentIndex] = True
         else:
             if not state.data._win:
@@ -549,6 +616,11 @@ def readCommand(argv):
                       help='Turns on exception handling and timeouts during games', default=False)
     parser.add_option('--timeout', dest='timeout', type='int',
                       help=default('Maximum length of time an agent can spend computing in a single game'), default=30)
+    parser.add_option('-j', '--jobs', dest='jobs', type='int',
+                      help=default('Number of worker processes that play the (non-training) games in parallel'), default=1)
+    parser.add_option('--seedGames', action='store_true', dest='seedGames',
+                      help='Seeds every non-training game from a master seed, as parallel games always are, '
+                           'so that the games played do not depend on the number of jobs', default=False)
 
     options, otherjunk = parser.parse_args(argv)
     if len(otherjunk) != 0:
@@ -596,6 +668,8 @@ def readCommand(argv):
     args['record'] = options.record
     args['catchExceptions'] = options.catchExceptions
     args['timeout'] = options.timeout
+    args['jobs'] = options.jobs
+    args['seedGames'] = options.seedGames
 
     # Special case: recorded games don't use the runGames method or args structure
     if options.gameToReplay is not None:
@@ -656,14 +730,160 @@ def replayGame(layout, actions, display):
     display.finish()
 
 
-def runGames(layout, pacman, ghosts, display, numGames, record, numTraining=0, catchExceptions=False, timeout=30):
-    import __main__
+class GameResult:
+    """
+    The outcome of a game played by a worker process of runGames: its final
+    score, whether Pacman won or lost, the number of moves made, the time each agent
+    spent computing, the move history (for recording) and a compact snapshot
+    of the final state (see GameStateData.toBytes).
+    """
+
+    def __init__(self, game):
+        self.layout = None  # Set by runParallelGames; layouts stay out of the results sent back
+        self._state = None
+        self.score = game.state.data.score
+        self.win = game.state.isWin()
+        self.lose = game.state.isLose()
+        self.moves = len(game.moveHistory)
+        self.agentTimes = list(game.totalAgentTimes)
+        self.moveHistory = game.moveHistory
+        self.finalState = game.state.data.toBytes()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['layout'] = state['_state'] = None
+        return state
+
+    @property
+    def state(self):
+        """The final GameState, like Game.state (rebuilt from the snapshot on first use)"""
+        if self._state is None:
+            if self.layout is None:
+                raise ValueError('the layout of this game is unknown; use getFinalState(layout)')
+            self._state = self.getFinalState(self.layout)
+        return self._state
+
+    def getFinalState(self, layout):
+        """Rebuilds the final GameState of the game, played on 'layout'"""
+        state = GameState()
+        state.data = GameStateData.fromBytes(self.finalState, layout)
+        return state
+
+    def isWin(self):
+        return self.win
+
+    def isLose(self):
+        return self.lose
+
+    def getScore(self):
+        return float(self.score)
+
+
+# The game settings shared with the worker processes of runGames
+_PARALLEL_GAME_SETTINGS = None
+
+
+def _runParallelGame(seed):
+    """
+    Plays one game quietly in a worker process with NullGraphics, after
+    seeding the random number generator with the game's own seed.
+    """
+    layout, pacman, ghosts, catchExceptions, timeout = _PARALLEL_GAME_SETTINGS
+    import __main__, textDisplay
+    display = textDisplay.NullGraphics()
+    __main__.__dict__['_display'] = display
+    random.seed(seed)
+    rules = ClassicGameRules(timeout)
+    game = rules.newGame(layout, pacman, ghosts, display, True, catchExceptions)
+    game.run()
+    return GameResult(game)
+
+
+def _recordGame(layout, moveHistory, index):
+    import time, pickle
+    fname = f'recorded-game-{index + 1}' + '-'.join([str(t) for t in time.localtime()[1:6]])
+    f = open(fname, 'wb')
+    components = {'layout': layout, 'actions': moveHistory}
+    pickle.dump(components, f)
+    f.close()
+
+
+def drawGameSeeds(numGames):
+    """
+    Returns one seed per game, derived from a master seed drawn from the
+    current random state.
+    """
+    seeder = random.Random(random.getrandbits(64))
+    return [seeder.getrandbits(64) for _ in range(numGames)]
+
+
+def runParallelGames(layout, pacman, ghosts, numGames, record, jobs, firstIndex=0, catchExceptions=False, timeout=30):
+    """
+    Plays numGames games in a pool of 'jobs' worker processes and returns their
+    GameResults in game order, as they stream back from the workers.  The
+    outcome of each game is printed here, in game order, as in runGames.
+
+    Each game is seeded with drawGameSeeds, so a run is reproducible (e.g. with
+    -f).  It plays the same games as runGames with a single job only when
+    runGames seeds its games too (seedGames, --seedGames); by default serial
+    games share the global random stream instead.  Workers are
+    forked, so agents need not be picklable, but agents do not carry state
+    from one game to the next.
+    """
+    global _PARALLEL_GAME_SETTINGS
+    import multiprocessing
+    seeds = drawGameSeeds(numGames)
+
+    _PARALLEL_GAME_SETTINGS = (layout, pacman, ghosts, catchExceptions, timeout)
+    results = []
+    try:
+        with multiprocessing.get_context('fork').Pool(jobs) as pool:
+            for i, result in enumerate(pool.imap(_runParallelGame, seeds)):
+                result.layout = layout
+                results.append(result)
+                if result.isWin():
+                    print(f"Pacman emerges victorious! Score: {result.score}")
+                elif result.isLose():
+                    print(f"Pacman died! Score: {result.score}")
+                if record: _recordGame(layout, result.moveHistory, firstIndex + i)
+    finally:
+        _PARALLEL_GAME_SETTINGS = None
+    return results
+
+
+def runGames(layout, pacman, ghosts, display, numGames, record, numTraining=0, catchExceptions=False, timeout=30, jobs=1,
+             explorationTracker=None, seedGames=False):
+    """
+    Plays numGames games and prints a summary of the non-training ones.
+
+    With jobs > 1 the training games are still played here, one after another,
+    and the remaining games are played by runParallelGames; the returned list
+    then holds their GameResults, which expose the final state like Game
+    objects do.  Parallel games are always seeded from drawGameSeeds; with
+    seedGames the games played here are seeded the same way, so the number
+    of jobs does not change the games played.  Otherwise they share the
+    random stream as they always have.
+
+    explorationTracker: optional ExplorationTracker recording these games
+    (see ClassicGameRules.newGame).  Tracked games are played here, since
+    worker processes would record into their own copies of the tracker.
+    """
+    import __main__, multiprocessing
     __main__.__dict__['_display'] = display
 
     rules = ClassicGameRules(timeout)
     games = []
 
-    for i in range(numGames):
+    if jobs > 1 and 'fork' not in multiprocessing.get_all_start_methods():
+        print('Parallel games need the fork start method; playing the games one at a time.')
+        jobs = 1
+    if jobs > 1 and (explorationTracker is not None or GameState.explorationTracker is not None):
+        print('Exploration is tracked in this process; playing the games one at a time.')
+        jobs = 1
+    numSerial = numGames if jobs <= 1 else min(numGames, numTraining)
+    seeds, randomState = None, None
+
+    for i in range(numSerial):
         beQuiet = i < numTraining
         if beQuiet:
             # Suppress output and graphics
@@ -673,21 +893,31 @@ def runGames(layout, pacman, ghosts, display, numGames, record, numTraining=0, c
         else:
             gameDisplay = display
             rules.quiet = False
-        game = rules.newGame(layout, pacman, ghosts, gameDisplay, beQuiet, catchExceptions)
+            if seedGames and seeds is None:
+                # The same seeds runParallelGames would play these games with
+                seeds = drawGameSeeds(numGames - numTraining)
+                randomState = random.getstate()
+            if seedGames:
+                random.seed(seeds[i - numTraining])
+        game = rules.newGame(layout, pacman, ghosts, gameDisplay, beQuiet, catchExceptions, explorationTracker)
         game.run()
         if not beQuiet: games.append(game)
 
         if record:
-            import time, pickle
-            fname = f'recorded-game-{i + 1}' + '-'.join([str(t) for t in time.localtime()[1:6]])
-            f = open(fname, 'wb')
-            components = {'layout': layout, 'actions': game.moveHistory}
-            pickle.dump(components, f)
-            f.close()
-
-    if (numGames - numTraining) > 0:
+            _recordGame(layout, game.moveHistory, i)
+    if randomState is not None:
+        random.setstate(randomState)
+
+    if numSerial < numGames:
+        games += runParallelGames(layout, pacman, ghosts, numGames - numSerial, record, jobs, numSerial,
+                                  catchExceptions, timeout)
+        scores = [result.getScore() for result in games]
+        wins = [result.isWin() for result in games]
+    else:
         scores = [game.state.getScore() for game in games]
         wins = [game.state.isWin() for game in games]
+
+    if (numGames - numTraining) > 0:
         winRate = wins.count(True) / float(len(wins))
         print(f'Average Score: {sum(scores) / float(len(scores))}')
         print('Scores:       ', ', '.join([str(score) for score in scores]))
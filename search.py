@@ -17,7 +17,11 @@ In search.py, you will implement generic search algorithms which are called by
 Pacman agents (in searchAgents.py).
 """
 
+import collections
+import json
+import time
 from abc import ABC, abstractmethod
+from array import array
 
 import util
 
@@ -69,6 +73,291 @@ class SearchProblem(ABC):
         util.raiseNotDefined()
 
 
+class SearchNodes:
+    """
+    A compact store for the nodes of a search tree.
+
+    Each node is identified by an integer index and only remembers the index of
+    its parent, the action that reached it and its path cost, so a frontier
+    entry never has to carry the full list of actions.  The plan for a node is
+    rebuilt by following the parent pointers back to the root.
+    """
+
+    ROOT = -1
+
+    def __init__(self):
+        self.parents = array('l')
+        self.actions = []
+        self.costs = array('d')
+
+    def add(self, parent=ROOT, action=None, cost=0):
+        """
+        Stores a new node reached from 'parent' through 'action' with a total
+        path cost of 'cost', and returns its index.
+        """
+        self.parents.append(parent)
+        self.actions.append(action)
+        self.costs.append(cost)
+        return len(self.parents) - 1
+
+    def getCost(self, node):
+        return self.costs[node]
+
+    def getActions(self, node):
+        """
+        Returns the list of actions that leads from the root to 'node'.
+        """
+        parents, actions = self.parents, self.actions
+        path = []
+        while parents[node] != SearchNodes.ROOT:
+            path.append(actions[node])
+            node = parents[node]
+        path.reverse()
+        return path
+
+    def __len__(self):
+        return len(self.parents)
+
+
+class SearchStatistics:
+    """
+    The work done by one run of a search algorithm, as gathered by
+    instrumentedSearch.  Times are wall-clock seconds.
+    """
+
+    def __init__(self, algorithm='', problem=''):
+        self.algorithm = algorithm
+        self.problem = problem
+        self.nodesExpanded = 0
+        self.nodesGenerated = 0
+        self.peakFrontierSize = 0
+        self.frontierPushes = 0
+        self.duplicatePushes = 0
+        self.heuristicCalls = 0
+        self.heuristicCacheHits = 0
+        self.heuristicCacheMisses = 0
+        self.successorTime = 0.0
+        self.heuristicTime = 0.0
+        self.queueTime = 0.0
+        self.totalTime = 0.0
+        self.pathLength = None
+
+    def asDict(self):
+        return dict(vars(self))
+
+    def toJSON(self):
+        return json.dumps(self.asDict(), sort_keys=True)
+
+    def __str__(self):
+        return (f'{self.algorithm} on {self.problem}: {self.nodesExpanded} expanded, '
+                f'{self.nodesGenerated} generated, peak frontier {self.peakFrontierSize}, '
+                f'{self.duplicatePushes} duplicate pushes, {self.heuristicCalls} heuristic calls; '
+                f'successors {self.successorTime:.3f}s, heuristic {self.heuristicTime:.3f}s, '
+                f'queue {self.queueTime:.3f}s, total {self.totalTime:.3f}s')
+
+
+class InstrumentedProblem(SearchProblem):
+    """
+    Wraps a SearchProblem and records expansions, generated successors and the
+    time spent in getSuccessors into a SearchStatistics object.  Any other
+    attribute (walls, heuristicInfo, ...) is read from the wrapped problem, so
+    heuristics can be handed the wrapper unchanged.
+    """
+
+    def __init__(self, problem, statistics):
+        self.problem = problem
+        self.statistics = statistics
+
+    def __getattr__(self, name):
+        attribute = getattr(self.problem, name)
+        if name == 'getPredecessors' and attribute is not None:
+            # Backward expansions of bidirectional searches are recorded too
+            return lambda state: self._recordExpansion(attribute, state)
+        return attribute
+
+    def getStartState(self):
+        return self.problem.getStartState()
+
+    def isGoalState(self, state):
+        return self.problem.isGoalState(state)
+
+    def getSuccessors(self, state):
+        return self._recordExpansion(self.problem.getSuccessors, state)
+
+    def _recordExpansion(self, expand, state):
+        start = time.perf_counter()
+        successors = expand(state)
+        self.statistics.successorTime += time.perf_counter() - start
+        self.statistics.nodesExpanded += 1
+        self.statistics.nodesGenerated += len(successors)
+        return successors
+
+    def getCostOfActions(self, actions):
+        return self.problem.getCostOfActions(actions)
+
+
+class InstrumentedFrontier:
+    """
+    Wraps one of the util queues to time its operations and to track its peak
+    size and the number of pushes of a state that was already pushed before.
+    'stateOf' extracts the search state from a queued item; None means the
+    items are the states themselves.
+    """
+
+    def __init__(self, frontier, statistics, stateOf):
+        self.frontier = frontier
+        self.statistics = statistics
+        self.stateOf = stateOf
+        self.pushedStates = set()
+
+    def push(self, item, *priority):
+        self._record(item, self.frontier.push, priority)
+
+    def update(self, item, priority):
+        # Lowering the priority of a queued item is not a duplicate push.
+        self._record(item, self.frontier.update, (priority,), item not in self.frontier)
+
+    def _record(self, item, operation, priority, isPush=True):
+        statistics = self.statistics
+        if isPush:
+            state = item if self.stateOf is None else self.stateOf(item)
+            if state in self.pushedStates:
+                statistics.duplicatePushes += 1
+            else:
+                self.pushedStates.add(state)
+        statistics.frontierPushes += 1
+        start = time.perf_counter()
+        operation(item, *priority)
+        statistics.queueTime += time.perf_counter() - start
+        statistics.peakFrontierSize = max(statistics.peakFrontierSize, len(self.frontier))
+
+    def pop(self):
+        start = time.perf_counter()
+        item = self.frontier.pop()
+        self.statistics.queueTime += time.perf_counter() - start
+        return item
+
+    def isEmpty(self):
+        return self.frontier.isEmpty()
+
+    def peekPriority(self):
+        return self.frontier.peekPriority()
+
+    def __len__(self):
+        return len(self.frontier)
+
+    def __contains__(self, item):
+        return item in self.frontier
+
+
+def _firstItem(item):
+    return item[0]
+
+
+def instrumentFrontier(problem, frontier, stateOf=_firstItem):
+    """
+    Returns 'frontier' wrapped in an InstrumentedFrontier when 'problem' is an
+    InstrumentedProblem, and 'frontier' itself otherwise.
+    """
+    if isinstance(problem, InstrumentedProblem):
+        return InstrumentedFrontier(frontier, problem.statistics, stateOf)
+    return frontier
+
+
+def instrumentHeuristic(problem, heuristic):
+    """
+    Returns 'heuristic' wrapped to count and time its calls when 'problem' is
+    an InstrumentedProblem, and 'heuristic' itself otherwise.
+    """
+    if not isinstance(problem, InstrumentedProblem) or heuristic is nullHeuristic:
+        return heuristic
+    statistics = problem.statistics
+
+    def timedHeuristic(state, problem=None):
+        start = time.perf_counter()
+        value = heuristic(state, problem)
+        statistics.heuristicTime += time.perf_counter() - start
+        statistics.heuristicCalls += 1
+        return value
+
+    return timedHeuristic
+
+
+class HeuristicCache:
+    """
+    Memoizes a heuristic by search state in a bounded least-recently-used
+    cache, counting its hits and misses.  A heuristic value only depends on
+    the state and the problem, so a cache must not be shared between
+    problems.  maxSize=None never evicts.
+    """
+
+    def __init__(self, heuristic, maxSize=100000, statistics=None):
+        self.heuristic = heuristic
+        self.maxSize = maxSize
+        self.statistics = statistics
+        self.values = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, state, problem=None):
+        values = self.values
+        if state in values:
+            values.move_to_end(state)
+            self.hits += 1
+            if self.statistics is not None:
+                self.statistics.heuristicCacheHits += 1
+            return values[state]
+
+        self.misses += 1
+        if self.statistics is not None:
+            self.statistics.heuristicCacheMisses += 1
+        value = values[state] = self.heuristic(state, problem)
+        if self.maxSize is not None and len(values) > self.maxSize:
+            values.popitem(last=False)
+        return value
+
+    def __len__(self):
+        return len(self.values)
+
+
+def cacheHeuristic(problem, heuristic, maxSize):
+    """
+    Returns 'heuristic' memoized in a HeuristicCache of at most maxSize
+    states; its hits and misses are also counted in the statistics of an
+    InstrumentedProblem.
+    """
+    statistics = problem.statistics if isinstance(problem, InstrumentedProblem) else None
+    return HeuristicCache(heuristic, maxSize, statistics)
+
+
+def instrumentedSearch(searchFunction, problem, *args, logFile=None, algorithm=None, **kwargs):
+    """
+    Runs searchFunction(problem, *args, **kwargs) and returns the plan it finds
+    together with a SearchStatistics describing the work it did.
+
+    logFile:   optional path or writable file; the statistics are appended to
+               it as one JSON line.
+    algorithm: name to report; defaults to the name of searchFunction.
+    """
+    if algorithm is None:
+        algorithm = getattr(searchFunction, '__name__', str(searchFunction))
+    statistics = SearchStatistics(algorithm, type(problem).__name__)
+    start = time.perf_counter()
+    actions = searchFunction(InstrumentedProblem(problem, statistics), *args, **kwargs)
+    statistics.totalTime = time.perf_counter() - start
+    if actions is not None:
+        # Plans of macro actions (see CorridorSearchProblem) are measured in moves
+        expandActions = getattr(problem, 'expandActions', None)
+        statistics.pathLength = len(actions if expandActions is None else expandActions(actions))
+    if logFile is not None:
+        if isinstance(logFile, str):
+            with open(logFile, 'a') as handle:
+                handle.write(statistics.toJSON() + '\n')
+        else:
+            logFile.write(statistics.toJSON() + '\n')
+    return actions, statistics
+
+
 def tinyMazeSearch(problem):
     """
     Returns a sequence of moves that solves tinyMaze.  For any other maze, the
@@ -95,21 +384,22 @@ def depthFirstSearch(problem):
     "*** YOUR CODE HERE ***"
     initialState = problem.getStartState()
     visitedNodes = set()
-    unvisitedNodes = util.Stack()
+    unvisitedNodes = instrumentFrontier(problem, util.Stack())
+    nodes = SearchNodes()
 
-    # Cada elemento es una tupla que tiene un estado y las acciones para llegar a él
-    unvisitedNodes.push((initialState, []))
+    # Cada elemento es una tupla que tiene un estado y el nodo por el que se llega a él
+    unvisitedNodes.push((initialState, nodes.add()))
 
     # Recorrer los elementos de la pila
     while not unvisitedNodes.isEmpty():
 
-        # Extraer de la pila el siguiente elemento (estado) + acciones
-        actualState, actions = unvisitedNodes.pop()
+        # Extraer de la pila el siguiente elemento (estado) + nodo
+        actualState, node = unvisitedNodes.pop()
 
         # Comprobar si el estado actual es un estado final
         if problem.isGoalState(actualState):
             # Sí es un estado final devolver las acciones para llegar a el
-            return actions
+            return nodes.getActions(node)
 
             # Solo visitar aquellos nodos que no hayan sido visitados antes
         if actualState not in visitedNodes:
@@ -122,8 +412,8 @@ def depthFirstSearch(problem):
 
             for successor, action, _ in successors:  # El coste no se va a usar para nada en este caso
 
-                # Añadir sucesores con las acciones actualizadas
-                unvisitedNodes.push((successor, actions + [action]))
+                # Añadir sucesores con un nuevo nodo que apunta al actual
+                unvisitedNodes.push((successor, nodes.add(node, action)))
 
                 # Si no quedan elementos en la cola y no ha habido ningun estado final, no hay camino
     return []
@@ -135,22 +425,23 @@ def breadthFirstSearch(problem):
     "*** YOUR CODE HERE ***"
     initialState = problem.getStartState()
     visitedNodes = set()
-    unvisitedNodes = util.Queue()
+    unvisitedNodes = instrumentFrontier(problem, util.Queue())
+    nodes = SearchNodes()
 
-    # Cada elemento es una tupla que tiene un estado y las acciones para llegar a él
-    unvisitedNodes.push((initialState, []))
+    # Cada elemento es una tupla que tiene un estado y el nodo por el que se llega a él
+    unvisitedNodes.push((initialState, nodes.add()))
 
     # Recorrer los elementos de la cola
     while not unvisitedNodes.isEmpty():
 
-        # Extraer de la cola el siguiente elemento (estado) + acciones
-        actualState, actions = unvisitedNodes.pop()
+        # Extraer de la cola el siguiente elemento (estado) + nodo
+        actualState, node = unvisitedNodes.pop()
 
         # Comprobar si el estado actual es un estado final
         if problem.isGoalState(actualState):
 
             # Sí es un estado final devolver las acciones para llegar él
-            return actions
+            return nodes.getActions(node)
 
         # Solo visitar aquellos nodos que no hayan sido visitados antes
         if actualState not in visitedNodes:
@@ -163,34 +454,42 @@ def breadthFirstSearch(problem):
 
             for successor, action, _ in successors:  # El coste no se va a usar para nada en este caso
 
-                # Añadir sucesores con las acciones actualizadas
-                unvisitedNodes.push((successor, actions + [action]))
+                # Añadir sucesores con un nuevo nodo que apunta al actual
+                unvisitedNodes.push((successor, nodes.add(node, action)))
 
     # Si no quedan elementos en la cola y no ha habido ningun estado final, no hay camino
     return []
 
 
-def uniformCostSearch(problem):
-    """*** YOUR CODE HERE ***"""
+def uniformCostSearch(problem, decreaseKey=False):
+    """
+    Search the node of least total cost first.
+
+    With decreaseKey=True every state is queued at most once and a cheaper path
+    to a queued state lowers its priority in place (see decreaseKeySearch).
+    """
+    if decreaseKey:
+        return decreaseKeySearch(problem)
 
     initialState = problem.getStartState()
     visitedNodes = set()
-    unvisitedNodes = util.PriorityQueue()
+    unvisitedNodes = instrumentFrontier(problem, util.PriorityQueue())
+    nodes = SearchNodes()
 
-    # Cada elemento es una tupla que tiene otra tupla (estado, acciones, costes) y un int (valor de prioridad)
-    unvisitedNodes.push((initialState, [], 0), 0)
+    # Cada elemento es una tupla (estado, nodo) y un int (valor de prioridad); el coste se guarda en el nodo
+    unvisitedNodes.push((initialState, nodes.add()), 0)
 
     # Recorrer los elementos de la cola de prioridad
     while not unvisitedNodes.isEmpty():
 
-        # Extraer de la cola de prioridad el siguiente elemento (estado + acciones + costes) + valor de prioridad
-        actualState, actions, costs = unvisitedNodes.pop()
+        # Extraer de la cola de prioridad el siguiente elemento (estado + nodo)
+        actualState, node = unvisitedNodes.pop()
 
         # Comprobar si el estado actual es un estado final
         if problem.isGoalState(actualState):
 
             # Sí es un estado final devolver las acciones para llegar él
-            return actions
+            return nodes.getActions(node)
 
         # Solo visitar aquellos nodos que no hayan sido visitados antes
         if actualState not in visitedNodes:
@@ -200,11 +499,12 @@ def uniformCostSearch(problem):
 
             # Obtener los sucesores del estado actual
             successors = problem.getSuccessors(actualState)
+            costs = nodes.getCost(node)
 
             for successor, action, cost in successors:
 
-                # Añadir sucesores con las acciones actualizadas
-                unvisitedNodes.push((successor, actions + [action], costs + cost), costs + cost)
+                # Añadir sucesores con un nuevo nodo que apunta al actual
+                unvisitedNodes.push((successor, nodes.add(node, action, costs + cost)), costs + cost)
 
     # Si no quedan elementos en la cola de prioridad y no ha habido ningun estado final, no hay camino
     return []
@@ -218,31 +518,45 @@ def nullHeuristic(state, problem=None):
     return 0
 
 
-def aStarSearch(problem, heuristic=nullHeuristic):
-    """Search the node that has the lowest combined cost and heuristic first."""
+def aStarSearch(problem, heuristic=nullHeuristic, decreaseKey=False, cacheSize=None):
+    """
+    Search the node that has the lowest combined cost and heuristic first.
+
+    With decreaseKey=True every state is queued at most once and a cheaper path
+    to a queued state lowers its priority in place (see decreaseKeySearch).
+
+    cacheSize memoizes the heuristic in a HeuristicCache of that many states,
+    which pays off for expensive heuristics of states reached many times.
+    """
     "*** YOUR CODE HERE ***"
+    if decreaseKey:
+        return decreaseKeySearch(problem, heuristic)
 
     initialState = problem.getStartState()
     visitedNodes = set()
-    unvisitedNodes = util.PriorityQueue()
+    unvisitedNodes = instrumentFrontier(problem, util.PriorityQueue())
+    nodes = SearchNodes()
+    heuristic = instrumentHeuristic(problem, heuristic)
+    if cacheSize is not None:
+        heuristic = cacheHeuristic(problem, heuristic, cacheSize)
 
     # El valor del heuristico será la distancia desde el estado actual hasta el objetivo
     dist_heuristic = heuristic(initialState, problem)
 
-    # Cada elemento es una tupla que tiene otra tupla (estado, acciones, costes) y un int (valor de prioridad)
-    unvisitedNodes.push((initialState, [], 0), dist_heuristic)
+    # Cada elemento es una tupla (estado, nodo) y un int (valor de prioridad); el coste se guarda en el nodo
+    unvisitedNodes.push((initialState, nodes.add()), dist_heuristic)
 
     # Recorrer los elementos de la cola de prioridad
     while not unvisitedNodes.isEmpty():
 
-        # Extraer de la cola de prioridad el siguiente elemento (estado + acciones + costes) + valor de prioridad
-        actualState, actions, costs = unvisitedNodes.pop()
+        # Extraer de la cola de prioridad el siguiente elemento (estado + nodo)
+        actualState, node = unvisitedNodes.pop()
 
         # Comprobar si el estado actual es un estado final
         if problem.isGoalState(actualState):
 
             # Sí es un estado final devolver las acciones para llegar él
-            return actions
+            return nodes.getActions(node)
 
         # Solo visitar aquellos nodos que no hayan sido visitados antes
         if actualState not in visitedNodes:
@@ -252,21 +566,368 @@ def aStarSearch(problem, heuristic=nullHeuristic):
 
             # Obtener los sucesores del estado actual
             successors = problem.getSuccessors(actualState)
+            costs = nodes.getCost(node)
 
             for successor, action, cost in successors:
 
+                # Los sucesores ya visitados se descartarían al sacarlos de la cola,
+                # así que no se calcula su heuristico ni se añaden
+                if successor in visitedNodes:
+                    continue
+
                 # Calcular el valor del heuristico para cada caso concreto
                 dist_heuristic = heuristic(successor, problem)
 
-                # Añadir sucesores con las acciones actualizadas
-                unvisitedNodes.push((successor, actions + [action], costs + cost), costs + cost + dist_heuristic)
+                # Añadir sucesores con un nuevo nodo que apunta al actual
+                unvisitedNodes.push((successor, nodes.add(node, action, costs + cost)), costs + cost + dist_heuristic)
 
     # Si no quedan elementos en la cola de prioridad y no ha habido ningun estado final, no hay camino
     return []
 
 
+def decreaseKeySearch(problem, heuristic=nullHeuristic):
+    """
+    Best-first search (uniform cost search or A*) that relaxes edges in place.
+
+    Instead of pushing a duplicate entry every time a state is reached, the
+    frontier is a util.IndexedPriorityQueue holding each state once; when a
+    cheaper path to a queued state is found its node is replaced and its
+    priority is lowered with a decrease-key.  The heuristic is evaluated once
+    per state.  Plans are optimal under the same conditions as aStarSearch, but
+    ties between equally good plans may be broken differently.
+    """
+    initialState = problem.getStartState()
+    closedStates = set()
+    frontier = instrumentFrontier(problem, util.IndexedPriorityQueue(), stateOf=None)
+    heuristic = instrumentHeuristic(problem, heuristic)
+    nodes = SearchNodes()
+    nodeOf = {initialState: nodes.add()}
+    estimates = {initialState: heuristic(initialState, problem)}
+    frontier.push(initialState, estimates[initialState])
+
+    while not frontier.isEmpty():
+        state = frontier.pop()
+        node = nodeOf.pop(state)
+        if problem.isGoalState(state):
+            return nodes.getActions(node)
+        closedStates.add(state)
+        pathCost = nodes.getCost(node)
+
+        for successor, action, stepCost in problem.getSuccessors(state):
+            if successor in closedStates:
+                continue
+            successorCost = pathCost + stepCost
+            if successor in frontier:
+                if successorCost >= nodes.getCost(nodeOf[successor]):
+                    continue
+            else:
+                estimates[successor] = heuristic(successor, problem)
+            nodeOf[successor] = nodes.add(node, action, successorCost)
+            frontier.update(successor, successorCost + estimates[successor])
+
+    return []
+
+
+def iterativeDeepeningAStarSearch(problem, heuristic=nullHeuristic, tableSize=None):
+    """
+    IDA*: repeated depth-first searches bounded by f = g + h, each one with the
+    bound raised to the smallest f that went over the previous bound.
+
+    Only the current path and the successors still to try along it are kept,
+    so memory grows with the length of the plan instead of with the number of
+    states reached; states are never repeated along the path.  tableSize
+    enables a transposition table holding, for at most that many states, the
+    cheapest path cost each one was reached with during the current
+    iteration; reaching one again at no lower cost is pruned.  Plans are
+    optimal when the heuristic is admissible.
+    """
+    heuristic = instrumentHeuristic(problem, heuristic)
+    startState = problem.getStartState()
+    bound = heuristic(startState, problem)
+    while True:
+        actions, bound = _boundedDepthFirstSearch(problem, heuristic, startState, bound, tableSize)
+        if actions is not None:
+            return actions
+        if bound == float('inf'):
+            return []
+
+
+def _boundedDepthFirstSearch(problem, heuristic, startState, bound, tableSize):
+    """
+    One IDA* iteration: returns (plan, None) if a goal is reached within
+    'bound', or (None, smallest f above 'bound') otherwise.
+    """
+    if problem.isGoalState(startState):
+        return [], None
+    table = {startState: 0} if tableSize else None
+    nextBound = float('inf')
+    path, pathCosts, actions = [startState], [0], []
+    onPath = {startState}
+    pending = [iter(problem.getSuccessors(startState))]
+
+    while pending:
+        entry = next(pending[-1], None)
+        if entry is None:
+            # Every successor of the last state on the path has been tried
+            pending.pop()
+            onPath.discard(path.pop())
+            pathCosts.pop()
+            if actions:
+                actions.pop()
+            continue
+
+        successor, action, stepCost = entry
+        if successor in onPath:
+            continue
+        successorCost = pathCosts[-1] + stepCost
+        if table is not None:
+            bestCost = table.get(successor)
+            if bestCost is not None and successorCost >= bestCost:
+                continue
+            if bestCost is not None or len(table) < tableSize:
+                table[successor] = successorCost
+
+        estimate = successorCost + heuristic(successor, problem)
+        if estimate > bound:
+            nextBound = min(nextBound, estimate)
+            continue
+        actions.append(action)
+        if problem.isGoalState(successor):
+            return actions, None
+        path.append(successor)
+        pathCosts.append(successorCost)
+        onPath.add(successor)
+        pending.append(iter(problem.getSuccessors(successor)))
+
+    return None, nextBound
+
+
+class ReversedSearchProblem(SearchProblem):
+    """
+    A view of a bidirectional problem (one with getGoalState and
+    getPredecessors) that searches from its goal back to its start: the
+    successors of a state are its predecessors and the goal is the original
+    start state, also exposed as 'goal' for heuristics.  Other attributes are
+    read from the original problem.
+    """
+
+    def __init__(self, problem):
+        self.problem = problem
+        self.goal = problem.getStartState()
+
+    def __getattr__(self, name):
+        return getattr(self.problem, name)
+
+    def getStartState(self):
+        return self.problem.getGoalState()
+
+    def isGoalState(self, state):
+        return state == self.goal
+
+    def getGoalState(self):
+        return self.goal
+
+    def getSuccessors(self, state):
+        return self.problem.getPredecessors(state)
+
+    def getPredecessors(self, state):
+        return self.problem.getSuccessors(state)
+
+    def getCostOfActions(self, actions):
+        """
+        Returns the cost of a plan that runs backwards from the goal, or
+        999999 if one of its actions does not lead to a predecessor.
+        """
+        state, totalCost = self.getStartState(), 0
+        for action in actions:
+            for previousState, previousAction, stepCost in self.problem.getPredecessors(state):
+                if previousAction == action:
+                    break
+            else:
+                return 999999
+            state, totalCost = previousState, totalCost + stepCost
+        return totalCost
+
+
+def isBidirectional(problem):
+    """
+    Whether 'problem' exposes the getGoalState and getPredecessors of
+    bidirectional search.  Problems whose goal test is not a single state
+    (such as AnyFoodSearchProblem) opt out by setting them to None.
+    """
+    return getattr(problem, 'getGoalState', None) is not None and \
+        getattr(problem, 'getPredecessors', None) is not None
+
+
+def _joinPlans(problem, forwardLinks, backwardLinks, meeting):
+    """
+    Returns the plan through 'meeting': forwardLinks maps a state to the
+    (previous state, action) that reached it from the start, backwardLinks to
+    the (next state, action) that leads from it towards the goal.  Raises a
+    ValueError if the plan does not end in a goal state of 'problem'.
+    """
+    plan = []
+    state = meeting
+    while forwardLinks[state] is not None:
+        state, action = forwardLinks[state]
+        plan.append(action)
+    plan.reverse()
+    state = meeting
+    while backwardLinks[state] is not None:
+        state, action = backwardLinks[state]
+        plan.append(action)
+    if not problem.isGoalState(state):
+        raise ValueError(f"bidirectional search ended in {state}, which is not a goal state")
+    return plan
+
+
+def bidirectionalBreadthFirstSearch(problem):
+    """
+    Breadth first search from the start and, through problem.getPredecessors,
+    backwards from problem.getGoalState() at the same time.  Each step
+    expands a whole layer of the side with the smaller frontier, and the
+    first state reached by both searches gives a plan with the fewest
+    actions, after exploring two balls of about half the radius of a one-way
+    search.  Problems that are not bidirectional get breadthFirstSearch.
+    """
+    if not isBidirectional(problem):
+        return breadthFirstSearch(problem)
+    start, goal = problem.getStartState(), problem.getGoalState()
+    if problem.isGoalState(start):
+        return []
+    forwardLinks, backwardLinks = {start: None}, {goal: None}
+    forwardLayer, backwardLayer = [start], [goal]
+    _recordLayers(problem, forwardLayer + backwardLayer, forwardLayer, backwardLayer)
+
+    while forwardLayer and backwardLayer:
+        if len(forwardLayer) <= len(backwardLayer):
+            forwardLayer, meeting = _expandLayer(forwardLayer, problem.getSuccessors, forwardLinks, backwardLinks)
+            _recordLayers(problem, forwardLayer, forwardLayer, backwardLayer)
+        else:
+            backwardLayer, meeting = _expandLayer(backwardLayer, problem.getPredecessors, backwardLinks, forwardLinks)
+            _recordLayers(problem, backwardLayer, forwardLayer, backwardLayer)
+        if meeting is not None:
+            return _joinPlans(problem, forwardLinks, backwardLinks, meeting)
+    return []
+
+
+def _recordLayers(problem, newLayer, forwardLayer, backwardLayer):
+    """
+    Records a new breadth first layer as frontier pushes, and the two current
+    layers as the frontier, when 'problem' is an InstrumentedProblem.
+    """
+    if isinstance(problem, InstrumentedProblem):
+        statistics = problem.statistics
+        statistics.frontierPushes += len(newLayer)
+        statistics.peakFrontierSize = max(statistics.peakFrontierSize, len(forwardLayer) + len(backwardLayer))
+
+
+def _expandLayer(layer, expand, links, otherLinks):
+    """
+    Expands every state of a breadth first layer, recording new states in
+    'links'; returns the next layer and the first state also in otherLinks
+    (None if the searches have not met).
+    """
+    nextLayer = []
+    for state in layer:
+        for neighbor, action, _ in expand(state):
+            if neighbor in links:
+                continue
+            links[neighbor] = (state, action)
+            if neighbor in otherLinks:
+                return nextLayer, neighbor
+            nextLayer.append(neighbor)
+    return nextLayer, None
+
+
+def bidirectionalAStarSearch(problem, heuristic=nullHeuristic):
+    """
+    A* from the start and, through problem.getPredecessors, backwards from
+    problem.getGoalState() at the same time, always expanding the side with
+    the smaller frontier.
+
+    The forward search is guided by heuristic(state, problem), the backward
+    one by the same heuristic on a ReversedSearchProblem (whose goal is the
+    start), and both are balanced with the average potential (hF - hB) / 2 so
+    that they explore the same reduced-cost graph.  The search stops once the
+    lowest keys of the two frontiers add up to the cost of the best meeting
+    found.  Plans are optimal for consistent heuristics; with nullHeuristic
+    this is bidirectional uniform cost search.  Problems that are not
+    bidirectional get aStarSearch.
+    """
+    if not isBidirectional(problem):
+        return aStarSearch(problem, heuristic)
+    start, goal = problem.getStartState(), problem.getGoalState()
+    if problem.isGoalState(start):
+        return []
+    heuristic = instrumentHeuristic(problem, heuristic)
+    reversedProblem = ReversedSearchProblem(problem)
+    potentials = {}
+
+    def potential(state):
+        if state not in potentials:
+            potentials[state] = (heuristic(state, problem) - heuristic(state, reversedProblem)) / 2
+        return potentials[state]
+
+    # Index 0 is the forward search and index 1 the backward one
+    expanders = (problem.getSuccessors, problem.getPredecessors)
+    signs = (1, -1)
+    costs = ({start: 0}, {goal: 0})
+    links = ({start: None}, {goal: None})
+    closedStates = (set(), set())
+    frontiers = (instrumentFrontier(problem, util.IndexedPriorityQueue(), stateOf=None),
+                 instrumentFrontier(problem, util.IndexedPriorityQueue(), stateOf=None))
+    frontiers[0].push(start, potential(start))
+    frontiers[1].push(goal, -potential(goal))
+    bestCost, meeting = float('inf'), None
+
+    while not frontiers[0].isEmpty() and not frontiers[1].isEmpty():
+        if frontiers[0].peekPriority() + frontiers[1].peekPriority() >= bestCost:
+            break
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        sideCosts, otherCosts = costs[side], costs[1 - side]
+        state = frontiers[side].pop()
+        closedStates[side].add(state)
+        for neighbor, action, stepCost in expanders[side](state):
+            if neighbor in closedStates[side]:
+                continue
+            cost = sideCosts[state] + stepCost
+            if cost >= sideCosts.get(neighbor, float('inf')):
+                continue
+            sideCosts[neighbor] = cost
+            links[side][neighbor] = (state, action)
+            frontiers[side].update(neighbor, cost + signs[side] * potential(neighbor))
+            if neighbor in otherCosts and cost + otherCosts[neighbor] < bestCost:
+                bestCost, meeting = cost + otherCosts[neighbor], neighbor
+
+    if meeting is None:
+        return []
+    return _joinPlans(problem, links[0], links[1], meeting)
+
+
+def bidirectionalUniformCostSearch(problem):
+    """Bidirectional uniform cost search (bidirectionalAStarSearch without a heuristic)."""
+    return bidirectionalAStarSearch(problem)
+
+
+def uniformCostSearchDecreaseKey(problem):
+    """Uniform cost search using an indexed frontier with decrease-key."""
+    return decreaseKeySearch(problem)
+
+
+def aStarSearchDecreaseKey(problem, heuristic=nullHeuristic):
+    """A* search using an indexed frontier with decrease-key."""
+    return decreaseKeySearch(problem, heuristic)
+
+
 # Abbreviations
 bfs = breadthFirstSearch
 dfs = depthFirstSearch
 astar = aStarSearch
 ucs = uniformCostSearch
+ucsdk = uniformCostSearchDecreaseKey
+astardk = aStarSearchDecreaseKey
+idastar = iterativeDeepeningAStarSearch
+bibfs = bidirectionalBreadthFirstSearch
+biucs = bidirectionalUniformCostSearch
+biastar = bidirectionalAStarSearch
@@ -36,10 +36,12 @@ Good luck and happy searching!
 
 import time
 
+import mazeDistances
 import search
 import util
 from game import Actions
 from game import Agent
+from game import BitGrid
 from game import Directions
 
 
@@ -72,17 +74,30 @@ class SearchAgent(Agent):
       depthFirstSearch or dfs
       breadthFirstSearch or bfs
 
+    Passing stats (or stats=FILE) prints the search statistics gathered by
+    search.instrumentedSearch (and appends them to FILE as a JSON line).
+    cacheSize=N memoizes the heuristic of search functions that support it
+    (see search.HeuristicCache), and tableSize=N bounds the transposition
+    table of idastar.  Passing corridors searches position problems through
+    a CorridorSearchProblem.
 
     Note: You should NOT change any code in SearchAgent
     """
 
-    def __init__(self, fn='depthFirstSearch', prob='PositionSearchProblem', heuristic='nullHeuristic'):
+    def __init__(self, fn='depthFirstSearch', prob='PositionSearchProblem', heuristic='nullHeuristic', stats=None,
+                 cacheSize=None, tableSize=None, corridors=False):
         # Warning: some advanced Python magic is employed below to find the right functions and problems
         super().__init__()
         # Get the search function from the name and heuristic
         if fn not in dir(search):
             raise AttributeError(fn + ' is not a search function in search.py.')
         func = getattr(search, fn)
+        options = {}
+        for option, value in (('cacheSize', cacheSize), ('tableSize', tableSize)):
+            if value is not None:
+                if option not in func.__code__.co_varnames:
+                    raise AttributeError(fn + ' does not support the ' + option + ' option.')
+                options[option] = int(value)
         if 'heuristic' not in func.__code__.co_varnames:
             print('[SearchAgent] using function ' + fn)
             self.searchFunction = func
@@ -95,13 +110,29 @@ class SearchAgent(Agent):
                 raise AttributeError(heuristic + ' is not a function in searchAgents.py or search.py.')
             print(f'[SearchAgent] using function {fn} and heuristic {heuristic}')
             # Note: this bit of Python trickery combines the search algorithm and the heuristic
-            self.searchFunction = lambda x: func(x, heuristic=heur)
+            self.searchFunction = lambda x: func(x, heuristic=heur, **options)
 
         # Get the search problem type from the name
         if prob not in globals().keys() or not prob.endswith('Problem'):
             raise AttributeError(prob + ' is not a search problem type in SearchAgents.py.')
         self.searchType = globals()[prob]
         print('[SearchAgent] using problem type ' + prob)
+        corridors = util.parseFlag(corridors)
+        if corridors and not issubclass(self.searchType, PositionSearchProblem):
+            raise AttributeError('corridors only apply to position search problems, not to ' + prob + '.')
+        if corridors and func in (search.depthFirstSearch, search.breadthFirstSearch,
+                                  search.bidirectionalBreadthFirstSearch):
+            print(f'[SearchAgent] warning: {fn} ignores step costs, so with corridors its plan '
+                  f'minimizes corridors, not moves')
+
+        # Report search statistics (see search.instrumentedSearch); a file name
+        # also appends them to that file as JSON lines.
+        try:
+            self.stats = util.parseFlag(stats)
+        except ValueError:
+            self.stats = stats  # Any other value is the name of the log file
+        self.searchName = fn
+        self.corridors = corridors
 
     def registerInitialState(self, state):
         """
@@ -115,7 +146,18 @@ class SearchAgent(Agent):
         if self.searchFunction is None: raise Exception("No search function provided for SearchAgent")
         starttime = time.time()
         problem = self.searchType(state)  # Makes a new search problem
-        self.actions = self.searchFunction(problem)  # Find a path
+        if self.corridors:
+            problem = CorridorSearchProblem(problem)
+        if self.stats:
+            logFile = self.stats if isinstance(self.stats, str) else None
+            self.actions, statistics = search.instrumentedSearch(self.searchFunction, problem, logFile=logFile,
+                                                                  algorithm=self.searchName)
+            print(f'Search statistics: {statistics}')
+        else:
+            self.actions = self.searchFunction(problem)  # Find a path
+        if hasattr(problem, 'expandActions'):
+            # Problems with macro actions turn the plan into primitive moves
+            self.actions = problem.expandActions(self.actions)
         totalCost = problem.getCostOfActions(self.actions)
         print(f'Path found with total cost of {totalCost} in {time.time() - starttime:.1f} seconds')
         if '_expanded' in dir(problem): print(f'Search nodes expanded: {problem._expanded}')
@@ -157,6 +199,7 @@ class PositionSearchProblem(search.SearchProblem):
         goal: A position in the gameState
         """
         self.walls = gameState.getWalls()
+        self.moves = Actions.getMoveTable(self.walls).successors
         self.startState = gameState.getPacmanPosition()
         if start is not None: self.startState = start
         self.goal = goal
@@ -197,14 +240,9 @@ class PositionSearchProblem(search.SearchProblem):
         """
 
         successors = []
-        for action in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
-            x, y = state
-            dx, dy = Actions.directionToVector(action)
-            nextx, nexty = int(x + dx), int(y + dy)
-            if not self.walls[nextx][nexty]:
-                nextState = (nextx, nexty)
-                cost = self.costFn(nextState)
-                successors.append((nextState, action, cost))
+        for nextState, action in self.moves[state]:
+            cost = self.costFn(nextState)
+            successors.append((nextState, action, cost))
 
         # Bookkeeping for display purposes
         self._expanded += 1  # DO NOT CHANGE
@@ -214,6 +252,28 @@ class PositionSearchProblem(search.SearchProblem):
 
         return successors
 
+    def getGoalState(self):
+        return self.goal
+
+    def getPredecessors(self, state):
+        """
+        Returns the states from which 'state' is one move away, the action
+        that moves each of them to 'state', and its cost, for bidirectional
+        search (see search.bidirectionalBreadthFirstSearch).
+        """
+        cost = self.costFn(state)
+        predecessors = []
+        for previousState, action in self.moves[state]:
+            predecessors.append((previousState, Actions.reverseDirection(action), cost))
+
+        # Bookkeeping for display purposes
+        self._expanded += 1  # DO NOT CHANGE
+        if state not in self._visited:
+            self._visited[state] = True
+            self._visitedlist.append(state)
+
+        return predecessors
+
     def getCostOfActions(self, actions):
         """
         Returns the cost of a particular sequence of actions. If those actions
@@ -291,6 +351,7 @@ class CornersProblem(search.SearchProblem):
         Stores the walls, pacman's starting position and corners.
         """
         self.walls = startingGameState.getWalls()
+        self.moves = Actions.getMoveTable(self.walls).successors
         self.startingPosition = startingGameState.getPacmanPosition()
         top, right = self.walls.height - 2, self.walls.width - 2
         self.corners = ((1, 1), (1, top), (right, 1), (right, top))
@@ -330,40 +391,28 @@ class CornersProblem(search.SearchProblem):
         """
 
         successors = []
-        for action in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
-            # Add a successor state to the successor list if the action is legal
-            # Here's a code snippet for figuring out whether a new position hits a wall:
-            #   x,y = currentPosition
-            #   dx, dy = Actions.directionToVector(action)
-            #   nextx, nexty = int(x + dx), int(y + dy)
-            #   hitsWall = self.walls[nextx][nexty]
-
-            # Figure out whether a new position hits a wall
-            x, y = state[0]
-            dx, dy = Actions.directionToVector(action)
-            nextx, nexty = int(x + dx), int(y + dy)
-            if not self.walls[nextx][nexty]:
-
-                nextPos = (nextx, nexty)
-                self.visitedcorners = list(state[1])  # Transformar la tupla en lista para modificar
+        # Los movimientos legales de cada casilla vienen precalculados en la tabla de movimientos
+        # del layout (ver MoveTable en game.py), así que no hace falta mirar las paredes
+        for nextPos, action in self.moves[state[0]]:
+            self.visitedcorners = list(state[1])  # Transformar la tupla en lista para modificar
 
-                if nextPos == self.corners[0]:
-                    self.visitedcorners[0] = True
+            if nextPos == self.corners[0]:
+                self.visitedcorners[0] = True
 
-                if nextPos == self.corners[1]:
-                    self.visitedcorners[1] = True
+            if nextPos == self.corners[1]:
+                self.visitedcorners[1] = True
 
-                if nextPos == self.corners[2]:
-                    self.visitedcorners[2] = True
+            if nextPos == self.corners[2]:
+                self.visitedcorners[2] = True
 
-                if nextPos == self.corners[3]:
-                    self.visitedcorners[3] = True
+            if nextPos == self.corners[3]:
+                self.visitedcorners[3] = True
 
-                self.visitedcorners = tuple(self.visitedcorners)  # Convertir otra vez en tupla
+            self.visitedcorners = tuple(self.visitedcorners)  # Convertir otra vez en tupla
 
-                nextState = nextPos, self.visitedcorners
-                cost = self.costFn(nextState)
-                successors.append((nextState, action, cost))
+            nextState = nextPos, self.visitedcorners
+            cost = self.costFn(nextState)
+            successors.append((nextState, action, cost))
 
         self._expanded += 1  # DO NOT CHANGE
         return successors
@@ -412,26 +461,25 @@ def cornersHeuristic(state, problem):
     if len(unvisitedCorners) == 0:
         return heuristic
 
-    # Hacer una iteracion por cada esquina a visitar
-    for _ in range(len(unvisitedCorners)):
-
-        # Calcular da distancia Manhattan desde la posicion actual hasta las esquinas por visitar
-        distances = []
-        for k in unvisitedCorners:
-            distances.append(util.manhattanDistance(pos, k))
+    # Calcular de una vez las distancias Manhattan desde la posicion actual (fila 0)
+    # y desde cada esquina (fila i + 1) hasta las esquinas por visitar
+    distances = util.manhattanDistanceMatrix([pos] + unvisitedCorners, unvisitedCorners)
+    currentRow = 0
+    remainingCorners = list(range(len(unvisitedCorners)))
 
-        # Encontrar el índice de la esquina más cercana
-        closestCornerIndex = distances.index(min(distances))
+    # Hacer una iteracion por cada esquina a visitar
+    while remainingCorners:
 
-        # Encontrar la distancia desde la posicion actual a la esquina más cercana
-        closestCornerDistance = distances[closestCornerIndex]
+        # Encontrar el índice de la esquina más cercana (la primera en caso de empate)
+        rowDistances = distances[currentRow]
+        closestCornerIndex = min(remainingCorners, key=rowDistances.__getitem__)
 
         # Sumar el coste al heuristico
-        heuristic += closestCornerDistance
+        heuristic += rowDistances[closestCornerIndex]
 
-        # Actualizar la posicion y remover la esquina visitada de unvisitedCorners
-        pos = unvisitedCorners[closestCornerIndex]
-        del unvisitedCorners[closestCornerIndex]
+        # Actualizar la posicion y remover la esquina visitada de las esquinas por visitar
+        currentRow = closestCornerIndex + 1
+        remainingCorners.remove(closestCornerIndex)
 
     return heuristic
 
@@ -453,11 +501,20 @@ class FoodSearchProblem:
     A search state in this problem is a tuple ( pacmanPosition, foodGrid ) where
       pacmanPosition: a tuple (x,y) of integers specifying Pacman's position
       foodGrid:       a Grid (see game.py) of either True or False, specifying remaining food
+
+    By default foodGrid is an immutable BitGrid (see game.py), which hashes in
+    O(1) and is shared, not copied, by successors that eat nothing.  Pass
+    bitboard=False to get a plain Grid copy per successor instead.
     """
 
-    def __init__(self, startingGameState):
-        self.start = (startingGameState.getPacmanPosition(), startingGameState.getFood())
+    def __init__(self, startingGameState, bitboard=True):
+        food = startingGameState.getFood()
+        if bitboard:
+            food = BitGrid.fromGrid(food)
+        self.start = (startingGameState.getPacmanPosition(), food)
+        self.bitboard = bitboard
         self.walls = startingGameState.getWalls()
+        self.moves = Actions.getMoveTable(self.walls).successors
         self.startingGameState = startingGameState
         self._expanded = 0  # DO NOT CHANGE
         self.heuristicInfo = {}  # A dictionary for the heuristic to store information
@@ -472,14 +529,13 @@ class FoodSearchProblem:
         """Returns successor states, the actions they require, and a cost of 1."""
         successors = []
         self._expanded += 1  # DO NOT CHANGE
-        for direction in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
-            x, y = state[0]
-            dx, dy = Actions.directionToVector(direction)
-            nextx, nexty = int(x + dx), int(y + dy)
-            if not self.walls[nextx][nexty]:
+        for (nextx, nexty), direction in self.moves[state[0]]:
+            if self.bitboard:
+                nextFood = state[1].without(nextx, nexty)
+            else:
                 nextFood = state[1].copy()
                 nextFood[nextx][nexty] = False
-                successors.append((((nextx, nexty), nextFood), direction, 1))
+            successors.append((((nextx, nexty), nextFood), direction, 1))
         return successors
 
     def getCostOfActions(self, actions):
@@ -537,36 +593,72 @@ def foodHeuristic(state, problem):
     """
     "*** YOUR CODE HERE ***"
 
+    # El heuristico es la distancia real (por el laberinto) hasta la comida más cercana más el
+    # peso del árbol de expansión mínima (MST) que une toda la comida restante.  Cualquier camino
+    # que se coma toda la comida llega primero a alguna comida y después recorre un árbol que las
+    # une a todas, así que es admisible; y también es consistente.
     position, foodGrid = state
-    unvisitedFood = foodGrid.asList()
-
-    if len(unvisitedFood) == 0:
+    if foodGrid.count() == 0:
         return 0
 
-    heuristic = 0
-
-    for i in range(len(unvisitedFood)):
+    # Las distancias entre todas las casillas se calculan una sola vez por layout
+    distances = mazeDistances.getMazeDistances(problem.walls)
 
-        distances = []
-        for food in unvisitedFood:
-            distances.append(util.manhattanDistance(position, food))
+    # El MST solo depende de la comida restante, así que se guarda por su máscara de bits
+    mstCache = problem.heuristicInfo.setdefault('foodMST', {})
+    mask = foodGrid.bits if isinstance(foodGrid, BitGrid) else foodGrid.asInt()
+    foodCells = None
+    if mask not in mstCache:
+        foodCells = [distances.cellIndex[food] for food in foodGrid.asList()]
+        mstCache[mask] = _minimumSpanningTreeWeight(distances, foodCells)
 
-        food_index = distances.index(max(distances))
+    # Distancia desde la posicion actual hasta la comida más cercana
+    if foodCells is None:
+        foodCells = [distances.cellIndex[food] for food in foodGrid.asList()]
+    row = distances.getRow(distances.cellIndex[position])
+    nearestFood = min([row[cell] for cell in foodCells])
 
-        food_distance = distances[food_index]
+    return nearestFood + mstCache[mask]
 
-        if food_distance > heuristic:
-            heuristic = food_distance
 
-        position = unvisitedFood[food_index]
-        del unvisitedFood[food_index]
+def _minimumSpanningTreeWeight(distances, cells):
+    """
+    Weight of the minimum spanning tree (Prim's algorithm) joining 'cells',
+    indices of a MazeDistances oracle, by their maze distances.
+    """
+    # Coste mínimo para unir cada casilla al árbol que se va construyendo
+    best = {cell: distances.UNREACHABLE for cell in cells[1:]}
+    cell, weight = cells[0], 0
+    while best:
+        row = distances.getRow(cell)
+        for other in best:
+            if row[other] < best[other]:
+                best[other] = row[other]
+        cell = min(best, key=best.get)
+        weight += best.pop(cell)
+    return weight
 
-    return heuristic
 
 class ClosestDotSearchAgent(SearchAgent):
-    """Search for all food using a sequence of searches"""
+    """
+    Search for all food using a sequence of searches
+
+    The plan is computed by planClosestDots, which never builds GameStates;
+    pass replay to plan each segment with findPathToClosestDot and replay it
+    on the GameState instead.
+    """
+
+    def __init__(self, replay=False, **kwargs):
+        super().__init__(**kwargs)
+        self.replay = util.parseFlag(replay)
 
     def registerInitialState(self, state):
+        if not self.replay:
+            self.actions = self.planClosestDots(state)
+            self.actionIndex = 0
+            print(f'Path found with cost {len(self.actions)}.')
+            return
+
         self.actions = []
         currentState = state
         while currentState.getFood().count() > 0:
@@ -580,6 +672,58 @@ class ClosestDotSearchAgent(SearchAgent):
         self.actionIndex = 0
         print(f'Path found with cost {len(self.actions)}.')
 
+    def planClosestDots(self, gameState):
+        """
+        Returns the plan that eats the closest dot over and over, the same one
+        that chaining findPathToClosestDot gives, computed on Pacman's
+        position and a bitmask of the remaining food instead of GameStates.
+
+        Each segment is a breadth first search with parent pointers over the
+        layout's move table that stops at the first food it reaches; paths
+        are only rebuilt for the dots eaten.  The whole plan is checked
+        against the walls of the GameState, not the move table, at the end.
+        """
+        walls = gameState.getWalls()
+        moveTable = Actions.getMoveTable(walls)
+        height = walls.height
+        food = BitGrid.fromGrid(gameState.getFood()).bits
+        start = position = tuple(map(int, gameState.getPacmanPosition()))
+        plan = []
+
+        while food:
+            parents = {position: None}
+            frontier = [position]
+            target = None
+            for cell in frontier:  # The frontier grows while it is read
+                if food >> (cell[0] * height + cell[1]) & 1:
+                    target = cell
+                    break
+                for nextCell, action in moveTable.successors[cell]:
+                    if nextCell not in parents:
+                        parents[nextCell] = (cell, action)
+                        frontier.append(nextCell)
+            if target is None:
+                break  # The remaining food cannot be reached
+
+            segment = []
+            cell = target
+            while parents[cell] is not None:
+                cell, action = parents[cell]
+                segment.append(action)
+            segment.reverse()
+            plan += segment
+            food &= ~(1 << (target[0] * height + target[1]))
+            position = target
+
+        x, y = start
+        for action in plan:
+            dx, dy = Actions.directionToVector(action)
+            nextx, nexty = int(x + dx), int(y + dy)
+            if (nextx, nexty) == (x, y) or walls[nextx][nexty]:
+                raise Exception(f'planClosestDots returned an illegal move: {action} at {(x, y)}!\n{gameState}')
+            x, y = nextx, nexty
+        return plan
+
     def findPathToClosestDot(self, gameState):
         """
         Returns a path (a list of actions) to the closest dot, starting from
@@ -634,6 +778,7 @@ class AnyFoodSearchProblem(PositionSearchProblem):
 
         # Store info for the PositionSearchProblem (no need to change this)
         self.walls = gameState.getWalls()
+        self.moves = Actions.getMoveTable(self.walls).successors
         self.startState = gameState.getPacmanPosition()
         self.costFn = lambda x: 1
         self._visited, self._visitedlist, self._expanded = {}, [], 0  # DO NOT CHANGE
@@ -646,6 +791,88 @@ class AnyFoodSearchProblem(PositionSearchProblem):
         pos = state
         return self.food[pos[0]][pos[1]]
 
+    # Any food is a goal, so there is no single goal state to search back from
+    getGoalState = None
+    getPredecessors = None
+
+
+class CorridorSearchProblem(search.SearchProblem):
+    """
+    Wraps a PositionSearchProblem (or a subclass such as AnyFoodSearchProblem)
+    so that every move runs along the corridor it enters, up to the next
+    junction, dead end or goal, and only those cells become search states.
+
+    Successor actions are tuples of primitive moves costing the sum of the
+    costs of the cells they enter.  An optimal plan never turns back inside
+    a corridor, so uniform cost search and A* still find optimal plans,
+    while breadth first search minimizes the number of corridors instead of
+    moves.  expandActions turns a plan back into primitive moves, which
+    SearchAgent does on its own; getCostOfActions accepts either form.
+    Other attributes are read from the wrapped problem, so its heuristics
+    work unchanged.
+    """
+
+    def __init__(self, problem):
+        self.problem = problem
+        self.moveTable = Actions.getMoveTable(problem.walls)
+        self._expanded = 0  # DO NOT CHANGE
+        # Corridor cells are probed for the goal before the search reaches them, so
+        # PositionSearchProblem's goal test, which draws the goal, is not called
+        if type(problem).isGoalState is PositionSearchProblem.isGoalState:
+            goal = problem.goal
+            self._isGoalCell = lambda cell: cell == goal
+        else:
+            self._isGoalCell = problem.isGoalState
+
+    def __getattr__(self, name):
+        if name in ('getGoalState', 'getPredecessors'):
+            # Backward moves are not compressed, so bidirectional search does not apply
+            raise AttributeError(name)
+        return getattr(self.problem, name)
+
+    def getStartState(self):
+        return self.problem.getStartState()
+
+    def isGoalState(self, state):
+        return self.problem.isGoalState(state)
+
+    def getSuccessors(self, state):
+        """Returns (cell, moves, cost) triples, moves being a tuple of primitive actions."""
+        problem = self.problem
+        isGoalCell = self._isGoalCell
+        successors = []
+        for _, direction in self.moveTable.successors[state]:
+            cells, directions = self.moveTable.getCorridor(state, direction)
+            length = len(cells)
+            for index, cell in enumerate(cells):
+                if isGoalCell(cell):
+                    length = index + 1
+                    break
+            cost = sum([problem.costFn(cell) for cell in cells[:length]])
+            successors.append((cells[length - 1], directions[:length], cost))
+
+        # Bookkeeping for display purposes
+        self._expanded += 1  # DO NOT CHANGE
+        if state not in problem._visited:
+            problem._visited[state] = True
+            problem._visitedlist.append(state)
+
+        return successors
+
+    def expandActions(self, actions):
+        """Returns the primitive moves of a plan made of successor actions and primitive moves"""
+        moves = []
+        for action in actions:
+            if isinstance(action, tuple):
+                moves.extend(action)
+            else:
+                moves.append(action)
+        return moves
+
+    def getCostOfActions(self, actions):
+        """Returns the cost of a plan of successor actions, primitive moves or both"""
+        return self.problem.getCostOfActions(self.expandActions(actions))
+
 
 def mazeDistance(point1, point2, gameState):
     """
@@ -656,11 +883,15 @@ def mazeDistance(point1, point2, gameState):
     Example usage: mazeDistance( (2,4), (5,6), gameState)
 
     This might be a useful helper function for your ApproximateSearchAgent.
+
+    Distances come from the cached all-pairs table of the layout (see
+    mazeDistances.py), so only the first call on a layout runs any search.
+    Unreachable points are 0 apart, as an empty BFS plan would say.
     """
     x1, y1 = point1
     x2, y2 = point2
     walls = gameState.getWalls()
     assert not walls[x1][y1], 'point1 is a wall: ' + str(point1)
     assert not walls[x2][y2], 'point2 is a wall: ' + str(point2)
-    prob = PositionSearchProblem(gameState, start=point1, goal=point2, warn=False, visualize=False)
-    return len(search.bfs(prob))
+    distance = mazeDistances.getMazeDistances(walls).getDistance(point1, point2)
+    return 0 if distance is None else distance
@@ -0,0 +1,70 @@
+import pickle
+
+import pytest
+
+from game import BitGrid, Grid
+
+# A 3x2 Grid with (0, 1) and (2, 0) set, pickled by the list-of-lists Grid
+# that recorded games were saved with before the bytearray columns
+LEGACY_GRID_PICKLE = (b'\x80\x02cgame\nGrid\nq\x00)\x81q\x01}q\x02(X\r\x00\x00\x00CELLS_PER_INTq\x03K\x1e'
+                      b'X\x05\x00\x00\x00widthq\x04K\x03X\x06\x00\x00\x00heightq\x05K\x02X\x04\x00\x00\x00'
+                      b'dataq\x06]q\x07(]q\x08(\x89\x88e]q\t(\x89\x89e]q\n(\x88\x89eeub.')
+
+
+def test_unpickles_legacy_grid():
+    grid = pickle.loads(LEGACY_GRID_PICKLE)
+    expected = Grid(3, 2)
+    expected[0][1] = True
+    expected[2][0] = True
+    assert grid == expected
+    assert hash(grid) == hash(expected)
+    assert grid.count() == 2
+    assert sorted(grid.asList()) == [(0, 1), (2, 0)]
+
+    copy = grid.copy()
+    copy[1][1] = True
+    assert copy.count() == 3
+    assert grid.count() == 2
+
+
+def test_cells_read_back_as_booleans():
+    grid = Grid(2, 3)
+    grid[1][2] = True
+    assert grid[1][2] is True
+    assert grid[0][0] is False
+    assert list(grid[1]) == [False, False, True]
+    assert grid[1][1:] == [False, True]
+    assert str(grid[1]) == '[False, False, True]'
+
+
+def test_pickle_round_trip():
+    grid = Grid(2, 2)
+    grid[0][1] = True
+    restored = pickle.loads(pickle.dumps(grid))
+    assert restored == grid
+    restored[1][0] = True
+    assert restored.count() == 2
+
+
+def test_bitgrid_indexes_like_grid():
+    grid = Grid(2, 3)
+    grid[1][0] = True
+    grid[0][2] = True
+    bitGrid = BitGrid.fromGrid(grid)
+    assert bitGrid[0][-1] is True
+    assert bitGrid[-1][0] is True
+    with pytest.raises(IndexError):
+        bitGrid[0][3]
+    with pytest.raises(IndexError):
+        bitGrid[2]
+
+
+def test_bitgrid_copy_is_a_mutable_grid():
+    grid = Grid(2, 3)
+    grid[1][0] = True
+    bitGrid = BitGrid.fromGrid(grid)
+    copy = bitGrid.copy()
+    copy[1][0] = False
+    assert copy.count() == 0
+    assert bitGrid.count() == 1
+    assert bitGrid.deepCopy() == grid
@@ -0,0 +1,19 @@
+import layout
+import textDisplay
+from ghostAgents import RandomGhost
+from pacman import ClassicGameRules, ExplorationTracker, GameState
+from pacmanAgents import GreedyAgent
+
+
+def test_exploration_tracker_records_one_game_only():
+    maze = layout.Layout(['%%%%%%%', '%P . .%', '%.%G% %', '%%%%%%%'])
+    tracker = ExplorationTracker()
+    rules = ClassicGameRules()
+    rules.newGame(maze, GreedyAgent(), [RandomGhost(1)], textDisplay.NullGraphics(), True,
+                  explorationTracker=tracker).run()
+    assert tracker.count > 0
+    assert GameState.explorationTracker is None
+
+    explored = tracker.count
+    rules.newGame(maze, GreedyAgent(), [RandomGhost(1)], textDisplay.NullGraphics(), True).run()
+    assert tracker.count == explored
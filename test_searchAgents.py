@@ -0,0 +1,18 @@
+import layout
+import search
+from pacman import GameState
+from searchAgents import CorridorSearchProblem, PositionSearchProblem
+
+
+def test_corridors_do_not_visit_the_goal_early():
+    maze = layout.Layout(['%%%%%%%%%', '%P      %', '% %%%%% %', '%.      %', '%%%%%%%%%'])
+    state = GameState()
+    state.initialize(maze, 0)
+    problem = PositionSearchProblem(state)
+    corridors = CorridorSearchProblem(problem)
+    corridors.getSuccessors(problem.getStartState())
+    assert problem._visitedlist == [problem.getStartState()]
+
+    plan = search.uniformCostSearch(corridors)
+    assert corridors.expandActions(plan) == ['South', 'South']
+    assert problem._visitedlist.count(problem.goal) == 1
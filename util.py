@@ -35,6 +35,11 @@ import time
 
 from collections import deque
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class FixedRandom:
     def __init__(self):
@@ -256,6 +261,7 @@ class PriorityQueue:
         return not bool(self)
 
     def update(self, item, priority):
+        # This scans the whole heap; see IndexedPriorityQueue for an O(log n) version.
         # If item already in priority queue with higher priority, update its priority and rebuild the heap.
         # If item already in priority queue with equal or lower priority, do nothing.
         # If item not in priority queue, do the same thing as self.push.
@@ -290,6 +296,113 @@ class PriorityQueue:
         return item in self.heap
 
 
+class IndexedPriorityQueue:
+    """
+      Implements a priority queue as an indexed binary heap.  Unlike
+      PriorityQueue, each item is queued at most once and the queue keeps a
+      map from every item to its slot in the heap, so membership tests are
+      O(1) and lowering the priority of a queued item (decrease-key) costs
+      O(log n) instead of a full scan.  Items must be hashable.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.slots = {}
+        self.count = 0
+
+    def push(self, item, priority):
+        # Pushing an item that is already queued behaves like self.update.
+        if item in self.slots:
+            self.update(item, priority)
+            return
+        entry = [priority, self.count, item]
+        self.count += 1
+        self.heap.append(entry)
+        self.slots[item] = len(self.heap) - 1
+        self._siftUp(len(self.heap) - 1)
+
+    def pop(self):
+        heap = self.heap
+        last = heap.pop()
+        if heap:
+            entry = heap[0]
+            heap[0] = last
+            self.slots[last[2]] = 0
+            self._siftDown(0)
+        else:
+            entry = last
+        del self.slots[entry[2]]
+        return entry[2]
+
+    def isEmpty(self):
+        return not bool(self)
+
+    def update(self, item, priority):
+        # Same contract as PriorityQueue.update: lower the priority of a queued
+        # item, ignore a higher or equal one and push the item if it is absent.
+        slot = self.slots.get(item)
+        if slot is None:
+            self.push(item, priority)
+        elif priority < self.heap[slot][0]:
+            # The insertion counter is kept, so ties still break by push order.
+            self.heap[slot][0] = priority
+            self._siftUp(slot)
+
+    def getPriority(self, item):
+        return self.heap[self.slots[item]][0]
+
+    def peekPriority(self):
+        # The lowest priority in the queue, without popping its item.
+        return self.heap[0][0]
+
+    def _siftUp(self, slot):
+        heap, slots = self.heap, self.slots
+        entry = heap[slot]
+        while slot > 0:
+            parentSlot = (slot - 1) >> 1
+            parent = heap[parentSlot]
+            if not entry < parent:
+                break
+            heap[slot] = parent
+            slots[parent[2]] = slot
+            slot = parentSlot
+        heap[slot] = entry
+        slots[entry[2]] = slot
+
+    def _siftDown(self, slot):
+        heap, slots = self.heap, self.slots
+        size = len(heap)
+        entry = heap[slot]
+        child = 2 * slot + 1
+        while child < size:
+            if child + 1 < size and heap[child + 1] < heap[child]:
+                child += 1
+            if not heap[child] < entry:
+                break
+            heap[slot] = heap[child]
+            slots[heap[slot][2]] = slot
+            slot = child
+            child = 2 * slot + 1
+        heap[slot] = entry
+        slots[entry[2]] = slot
+
+    def __bool__(self):
+        return bool(self.heap)
+
+    def __iter__(self):
+        # **IMPORTANT**: It will iterate poping objects
+        # You can add new objects while iterating
+        # It will stop iterating when no more items are left (empty heap)
+        while self.heap:
+            yield self.pop()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, item):
+        return item in self.slots
+
+
 class PriorityQueueWithFunction(PriorityQueue):
     """
     Implements a priority queue with the same push/pop signature of the
@@ -308,9 +421,41 @@ class PriorityQueueWithFunction(PriorityQueue):
         PriorityQueue.push(self, item, self.priorityFunction(item))
 
 
+# Batches of fewer distances than this are faster in pure Python than in NumPy
+NUMPY_BATCH_THRESHOLD = 256
+
+
 def manhattanDistance(xy1, xy2):
     """Returns the Manhattan distance between points xy1 and xy2"""
-    return sum([abs(component_1 - component_2) for component_1, component_2 in zip(xy1, xy2)])
+    try:
+        (x1, y1), (x2, y2) = xy1, xy2
+    except ValueError:
+        return sum([abs(component_1 - component_2) for component_1, component_2 in zip(xy1, xy2)])
+    return abs(x1 - x2) + abs(y1 - y2)
+
+
+def manhattanDistances(xy, points):
+    """
+    Returns the list of the Manhattan distances from the 2-dimensional point
+    xy to each of 'points'.  Big batches are computed with NumPy when it is
+    installed.
+    """
+    if numpy is not None and len(points) >= NUMPY_BATCH_THRESHOLD:
+        return numpy.abs(numpy.asarray(points) - numpy.asarray(xy)).sum(axis=1).tolist()
+    x, y = xy
+    return [abs(x - px) + abs(y - py) for px, py in points]
+
+
+def manhattanDistanceMatrix(points1, points2):
+    """
+    Returns the Manhattan distances between two lists of 2-dimensional points
+    as a list of rows: matrix[i][j] is the distance from points1[i] to
+    points2[j].  Big batches are computed with NumPy when it is installed.
+    """
+    if numpy is not None and len(points1) * len(points2) >= NUMPY_BATCH_THRESHOLD:
+        array1, array2 = numpy.asarray(points1), numpy.asarray(points2)
+        return numpy.abs(array1[:, None, :] - array2[None, :, :]).sum(axis=2).tolist()
+    return [manhattanDistances(xy, points2) for xy in points1]
 
 
 """
@@ -683,6 +828,19 @@ def lookup(name, namespace):
         raise Exception(f'{name} not found as a method or class')
 
 
+def parseFlag(value):
+    """
+    Returns the boolean value of an agent option.  Options given with -a
+    arrive as strings ('True', 'False', '0', ...), or as 1 for a bare flag.
+    """
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in ('true', 'yes', 'on', '1'): return True
+        if lowered in ('false', 'no', 'off', '0', 'none', ''): return False
+        raise ValueError(f'{value} is not a boolean option value')
+    return bool(value)
+
+
 def pause():
     """
     Pauses the output stream awaiting user feedback.